@@ -1,10 +1,11 @@
-import gradio as gr
 from src.config_manager import ConfigManager
-from src.comfy_client import ComfyClient
-from src.ui import create_ui
+from src.startup_profile import StartupProfile
 import os
 import argparse
 
+# Client and UI modules are imported inside main(), after the backend probe has
+# started, so the probe's network round trips overlap with importing gradio.
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="SimplUI")
@@ -13,6 +14,11 @@ def parse_args():
     )
     parser.add_argument("--listen-addr", type=str, help="Local listen address (e.g. 0.0.0.0:7860)")
     parser.add_argument("--config", type=str, default="config.json", help="Path to config.json")
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="Print how long each startup phase and the slowest imports took",
+    )
     return parser.parse_args()
 
 
@@ -39,8 +45,10 @@ def main():
         print(f"Error: {args.config} not found.")
         return
 
+    profile = StartupProfile(args.startup_profile)
     try:
-        config = ConfigManager(args.config)
+        with profile.phase("load config"):
+            config = ConfigManager(args.config)
 
         # Precedence: CLI > Config
         comfy_url = config.comfy_url
@@ -56,20 +64,36 @@ def main():
             if not os.path.exists(wf["path"]):
                 print(f"Warning: Workflow file not found at {wf['path']}")
 
-        client = ComfyClient(comfy_url)
+        with profile.phase("import client"):
+            from src.comfy_client import ComfyClient
+            from src.comfy_pool import ComfyPool
+            from src.job_scheduler import JobScheduler
+            from src.backend_status import BackendStatus
+
+        if not args.comfy_addr and len(config.backends) > 1:
+            client = ComfyPool(config.backends)
+            comfy_url = client.base_url
+        else:
+            client = ComfyClient(comfy_url)
+
+        # Probe ComfyUI in the background so the UI starts listening right away
+        backend_status = BackendStatus(client, comfy_url).start()
+
+        # Every session's prompts go through one scheduler that shares the backends fairly
+        client = JobScheduler(client, config.max_in_flight, config.max_bulk_in_flight)
 
-        if not client.check_connection():
-            print(
-                f"Warning: Could not connect to ComfyUI at {comfy_url}. Check if the server is running."
-            )
+        with profile.phase("import ui"):
+            from src.ui import create_ui
 
-        demo = create_ui(config, client)
+        with profile.phase("build ui"):
+            demo = create_ui(config, client, backend_status)
 
         # Listen address splitting
         listen_host, listen_port = split_addr(args.listen_addr, "0.0.0.0", 7860)
 
         print(f"Connecting to ComfyUI at: {comfy_url}")
         print(f"Launching Gradio UI at http://{listen_host}:{listen_port}")
+        profile.report()
 
         # Launching with debug=True can help see errors in the console
         demo.launch(
@@ -78,6 +102,8 @@ def main():
             debug=True,
             css=demo.css,
             js=demo.js,
+            # The History tab offers the archived copies for download
+            allowed_paths=[config.archive_dir] if config.archive_dir else None,
         )
 
     except Exception as e:
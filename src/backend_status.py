@@ -0,0 +1,45 @@
+import threading
+import time
+
+CONNECTING = "connecting"
+CONNECTED = "connected"
+UNREACHABLE = "unreachable"
+
+# Seconds between connection attempts while ComfyUI is not answering.
+PROBE_RETRY_INTERVAL = 5
+
+
+class BackendStatus:
+    """Connection state of ComfyUI, probed in the background so startup never waits on it."""
+
+    def __init__(self, comfy_client, comfy_url):
+        self.comfy_client = comfy_client
+        self.comfy_url = comfy_url
+        self.state = CONNECTING
+
+    @property
+    def connected(self):
+        return self.state == CONNECTED
+
+    def describe(self):
+        if self.state == CONNECTED:
+            return "Ready"
+        if self.state == CONNECTING:
+            return "Connecting to ComfyUI..."
+        return f"ComfyUI is not reachable at {self.comfy_url}, retrying..."
+
+    def start(self):
+        threading.Thread(target=self._probe, name="backend-probe", daemon=True).start()
+        return self
+
+    def _probe(self):
+        while not self.comfy_client.check_connection():
+            if self.state == CONNECTING:
+                print(
+                    f"Warning: Could not connect to ComfyUI at {self.comfy_url}. Check if the server is running."
+                )
+            self.state = UNREACHABLE
+            time.sleep(PROBE_RETRY_INTERVAL)
+        if self.state == UNREACHABLE:
+            print(f"Connected to ComfyUI at {self.comfy_url}")
+        self.state = CONNECTED
@@ -1,13 +1,96 @@
 import requests
+import httpx
+import asyncio
+import collections
+import contextlib
 import json
 import uuid
-import websockets
 import struct
+import concurrent.futures
+import urllib.parse
+
+# Upper bound on pooled connections held open to a single ComfyUI server.
+HTTP_MAX_CONNECTIONS = 20
+
+# Short timeout for load polling so a dead backend cannot stall prompt placement.
+QUEUE_POLL_TIMEOUT = 2
+
+# Websocket messages that carry a prompt_id and are forwarded to that prompt's queue.
+ROUTED_MESSAGE_TYPES = ("progress", "executed")
+
+# Parallel /object_info/{class} requests made while loading node definitions.
+OBJECT_INFO_WORKERS = 8
+
+# Binary websocket frame type of a preview image.
+PREVIEW_FRAME = 1
+_PREVIEW_HEADER = struct.pack(">I", PREVIEW_FRAME)
+
+
+def _is_preview_frame(message):
+    return isinstance(message, bytes) and message[:4] == _PREVIEW_HEADER
+
+
+class _PromptQueue(asyncio.Queue):
+    """Messages of one prompt waiting for its stream.
+
+    Pipelined prompts run before anyone streams them, so only the newest preview
+    frame is kept; older ones would never be shown.
+    """
+
+    def _put(self, item):
+        if _is_preview_frame(item):
+            self._queue = collections.deque(m for m in self._queue if not _is_preview_frame(m))
+        super()._put(item)
 
 
 class ComfyClient:
     def __init__(self, base_url):
         self.base_url = base_url.rstrip("/")
+        self.client_id = str(uuid.uuid4())
+        self._http = None
+        self._http_loop = None
+        self._ws = None
+        self._ws_loop = None
+        self._ws_lock = None
+        self._dispatcher = None
+        self._prompt_queues = {}
+        self._closed_prompts = set()
+        self._executing_prompt_id = None
+
+    def _async_http(self):
+        # httpx pools are bound to the event loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                ),
+            )
+            self._http_loop = loop
+        return self._http
+
+    async def aclose(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._http_loop = None
+
+    @staticmethod
+    def _comfy_error(status_code, response):
+        error_body = ""
+        try:
+            error_body = response.json()
+        except Exception:
+            error_body = response.text
+        return Exception(f"ComfyUI Error ({status_code}): {error_body}")
 
     def check_connection(self):
         try:
@@ -25,77 +108,185 @@ class ComfyClient:
         try:
             response.raise_for_status()
         except requests.exceptions.HTTPError as e:
-            error_body = ""
-            try:
-                error_body = response.json()
-            except Exception:
-                error_body = response.text
-            raise Exception(f"ComfyUI Error ({response.status_code}): {error_body}") from e
+            raise self._comfy_error(response.status_code, response) from e
         return response.json().get("prompt_id")
 
-    async def generate_image(self, workflow):
-        client_id = str(uuid.uuid4())
-        ws_url = self.base_url.replace("http://", "ws://").replace("https://", "wss://")
-        async with websockets.connect(
-            f"{ws_url}/ws?clientId={client_id}", max_size=10 * 1024 * 1024
-        ) as websocket:
-
-            # Submit workflow AFTER connecting
-            try:
-                prompt_id = self.submit_workflow(workflow, client_id)
-            except Exception as e:
-                raise e
+    async def submit_workflow_async(self, workflow, client_id):
+        response = await self._async_http().post(
+            "/prompt",
+            json={"prompt": workflow, "client_id": client_id},
+            timeout=10,
+        )
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise self._comfy_error(response.status_code, response) from e
+        return response.json().get("prompt_id")
+
+    async def _ensure_websocket(self):
+        loop = asyncio.get_running_loop()
+        if self._ws_loop is not loop:
+            # Sockets and queues cannot be shared across event loops
+            self._ws = None
+            self._dispatcher = None
+            self._ws_lock = asyncio.Lock()
+            self._prompt_queues = {}
+            self._closed_prompts = set()
+            self._executing_prompt_id = None
+            self._ws_loop = loop
+
+        async with self._ws_lock:
+            if self._ws is None:
+                # Only needed once something is generated, keep it off the startup path
+                import websockets
 
+                ws_url = self.base_url.replace("http://", "ws://").replace("https://", "wss://")
+                self._ws = await websockets.connect(
+                    f"{ws_url}/ws?clientId={self.client_id}", max_size=10 * 1024 * 1024
+                )
+                self._dispatcher = asyncio.create_task(self._dispatch(self._ws))
+        return self._ws
+
+    def _route(self, prompt_id, message, finished=False):
+        if prompt_id in self._closed_prompts:
+            # Nobody is listening for this prompt any more
+            if finished:
+                self._closed_prompts.discard(prompt_id)
+            return
+        self._prompt_queues.setdefault(prompt_id, _PromptQueue()).put_nowait(message)
+
+    async def _dispatch(self, websocket):
+        error = None
+        try:
             while True:
                 message = await websocket.recv()
                 if isinstance(message, str):
                     message = json.loads(message)
+                    data = message.get("data") or {}
+                    prompt_id = data.get("prompt_id")
+                    if message.get("type") == "executing":
+                        # Binary preview frames carry no prompt_id, so remember which
+                        # prompt is on the GPU and attribute them to it.
+                        finished = data.get("node") is None
+                        self._executing_prompt_id = None if finished else prompt_id
+                        if prompt_id is not None:
+                            self._route(prompt_id, message, finished)
+                    elif message.get("type") in ROUTED_MESSAGE_TYPES and prompt_id is not None:
+                        self._route(prompt_id, message)
+                elif isinstance(message, bytes):
+                    if self._executing_prompt_id is not None:
+                        self._route(self._executing_prompt_id, message)
+        except asyncio.CancelledError:
+            error = ConnectionError("ComfyUI websocket closed")
+            raise
+        except Exception as e:
+            error = ConnectionError(f"ComfyUI websocket lost: {e}")
+        finally:
+            if self._ws is websocket:
+                self._ws = None
+                self._executing_prompt_id = None
+            # Wake every waiting generator so it can fail instead of hanging
+            for queue in self._prompt_queues.values():
+                queue.put_nowait(error)
+
+    async def queue_prompt(self, workflow):
+        """Submits a workflow and returns its prompt_id without waiting for it to run."""
+        await self._ensure_websocket()
+        prompt_id = await self.submit_workflow_async(workflow, self.client_id)
+        self._prompt_queues.setdefault(prompt_id, _PromptQueue())
+        return prompt_id
+
+    async def generate_image(self, workflow):
+        prompt_id = await self.queue_prompt(workflow)
+        yield {"type": "queued", "prompt_id": prompt_id}
+        async with contextlib.aclosing(self.stream_prompt(prompt_id)) as events:
+            async for event in events:
+                yield event
+
+    async def stream_prompt(self, prompt_id):
+        """Yields the event stream of a prompt previously submitted with queue_prompt."""
+        queue = self._prompt_queues.setdefault(prompt_id, _PromptQueue())
+        finished = False
+
+        try:
+            while True:
+                message = await queue.get()
+                if isinstance(message, Exception):
+                    raise message
+                if isinstance(message, dict):
+                    data = message["data"]
                     if message["type"] == "progress":
-                        data = message["data"]
-                        if data["prompt_id"] == prompt_id:
-                            yield {
-                                "type": "progress",
-                                "value": data["value"],
-                                "max": data["max"],
-                            }
+                        yield {
+                            "type": "progress",
+                            "value": data["value"],
+                            "max": data["max"],
+                        }
                     elif message["type"] == "executing":
-                        data = message["data"]
                         # node is None means the entire prompt is finished
-                        if data["node"] is None and data["prompt_id"] == prompt_id:
+                        if data["node"] is None:
+                            finished = True
                             break
                     elif message["type"] == "executed":
-                        data = message["data"]
-                        if data["prompt_id"] == prompt_id:
-                            outputs = data["output"]
-                            for key in outputs:
-                                for image in outputs[key]:
-                                    if image.get("type") in ["output", "temp"]:
-                                        filename = image["filename"]
-                                        subfolder = image["subfolder"]
-                                        image_data = self._get_image(
-                                            filename, subfolder, image["type"]
-                                        )
-                                        yield {"type": "image", "data": image_data}
+                        outputs = data["output"]
+                        for key in outputs:
+                            for image in outputs[key]:
+                                if image.get("type") in ["output", "temp"]:
+                                    filename = image["filename"]
+                                    subfolder = image["subfolder"]
+                                    image_data = await self._get_image_async(
+                                        filename, subfolder, image["type"]
+                                    )
+                                    yield {"type": "image", "data": image_data}
                 elif isinstance(message, bytes):
                     # Binary message header: 4 bytes for type, 4 bytes for format
                     if len(message) > 8:
-                        msg_type = struct.unpack(">I", message[0:4])[0]
-                        if msg_type == 1: # Preview
-                            yield {"type": "preview", "data": message[8:]}
-                        elif msg_type == 2: # Final Image (Websocket Output)
-                            yield {"type": "image", "data": message[8:]}
+                        msg_type = struct.unpack_from(">I", message)[0]
+                        # A view of the frame, so the image bytes are never copied
+                        payload = memoryview(message)[8:]
+                        if msg_type == PREVIEW_FRAME:
+                            yield {"type": "preview", "data": payload}
+                        elif msg_type == 2:  # Final Image (Websocket Output)
+                            yield {"type": "image", "data": payload}
                         else:
                             # Unknown type, treat as preview for safety
-                            yield {"type": "preview", "data": message[8:]}
+                            yield {"type": "preview", "data": payload}
+        finally:
+            if not finished:
+                self._abandon(prompt_id)
+            else:
+                self._prompt_queues.pop(prompt_id, None)
+
+    def _abandon(self, prompt_id):
+        self._prompt_queues.pop(prompt_id, None)
+        self._closed_prompts.add(prompt_id)
 
-    def _get_image(self, filename, subfolder, folder_type):
-        response = requests.get(
-            f"{self.base_url}/view",
+    async def delete_queued(self, prompt_ids):
+        """Removes prompts that have not started yet from the ComfyUI queue."""
+        prompt_ids = list(prompt_ids)
+        if not prompt_ids:
+            return
+        for prompt_id in prompt_ids:
+            self._abandon(prompt_id)
+        try:
+            await self._async_http().post("/queue", json={"delete": prompt_ids}, timeout=5)
+        except Exception:
+            pass
+        finally:
+            # A deleted prompt never sends the final executing message that would
+            # otherwise clear it
+            self._closed_prompts.difference_update(prompt_ids)
+
+    async def _get_image_async(self, filename, subfolder, folder_type):
+        response = await self._async_http().get(
+            "/view",
             params={"filename": filename, "subfolder": subfolder, "type": folder_type},
             timeout=30,
         )
         return response.content
 
+    def backend_of(self, prompt_id):
+        return self.base_url
+
     def find_node_by_title(self, workflow, title):
         title = title.lower()
         for node_id, node_data in workflow.items():
@@ -122,23 +313,70 @@ class ComfyClient:
             return True
         return False
 
-    def interrupt(self):
+    async def _get_queue_async(self):
         try:
-            requests.post(f"{self.base_url}/interrupt", timeout=5)
+            response = await self._async_http().get("/queue", timeout=QUEUE_POLL_TIMEOUT)
+            if response.status_code == 200:
+                return response.json()
         except Exception:
             pass
+        return None
+
+    async def get_queue_load_async(self):
+        """Returns the number of running plus pending prompts, or None if unreachable."""
+        queue = await self._get_queue_async()
+        if queue is None:
+            return None
+        return len(queue.get("queue_running", [])) + len(queue.get("queue_pending", []))
 
-    def clear_queue(self):
+    async def cancel_prompts(self, prompt_ids):
+        """Cancels only the given prompts: queued ones are deleted, a running one is interrupted."""
+        prompt_ids = list(prompt_ids)
+        if not prompt_ids:
+            return
+        queue = await self._get_queue_async() or {}
+        # Queue entries are [number, prompt_id, prompt, extra_data, outputs]
+        running = {item[1] for item in queue.get("queue_running", [])}
+        running.add(self._executing_prompt_id)
+
+        await self.delete_queued([p for p in prompt_ids if p not in running])
+        for prompt_id in prompt_ids:
+            if prompt_id in running:
+                self._abandon(prompt_id)
+                try:
+                    # Servers that understand prompt_id won't interrupt anyone else's prompt
+                    await self._async_http().post(
+                        "/interrupt", json={"prompt_id": prompt_id}, timeout=5
+                    )
+                except Exception:
+                    pass
+
+    def get_object_info(self):
         try:
-            requests.post(f"{self.base_url}/queue", json={"clear": True}, timeout=5)
+            response = requests.get(f"{self.base_url}/object_info", timeout=10)
+            if response.status_code == 200:
+                return response.json()
         except Exception:
             pass
+        return {}
 
-    def get_object_info(self):
+    def get_node_info(self, class_type):
+        """Fetches the definition of a single node class, keyed by class_type."""
         try:
-            response = requests.get(f"{self.base_url}/object_info", timeout=10)
+            response = requests.get(
+                f"{self.base_url}/object_info/{urllib.parse.quote(class_type, safe='')}",
+                timeout=10,
+            )
             if response.status_code == 200:
                 return response.json()
         except Exception:
             pass
         return {}
+
+    def get_object_info_for(self, class_types):
+        """Like get_object_info, limited to the given node classes."""
+        object_info = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=OBJECT_INFO_WORKERS) as executor:
+            for node_info in executor.map(self.get_node_info, class_types):
+                object_info.update(node_info)
+        return object_info
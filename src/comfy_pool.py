@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import time
+
+try:
+    from .comfy_client import ComfyClient
+except ImportError:
+    from comfy_client import ComfyClient
+
+# Seconds an unreachable backend is skipped before it is polled again.
+UNHEALTHY_COOLDOWN = 10.0
+
+
+class ComfyPool:
+    """Spreads prompts over several ComfyUI servers behind the ComfyClient interface."""
+
+    def __init__(self, backends):
+        self.clients = []
+        self.weights = {}
+        for backend in backends:
+            client = ComfyClient(backend["url"])
+            self.clients.append(client)
+            self.weights[client] = backend.get("weight", 1)
+        self.base_url = ", ".join(client.base_url for client in self.clients)
+        self._owners = {}
+        self._reserved = {client: 0 for client in self.clients}
+        self._unhealthy_until = {client: 0.0 for client in self.clients}
+
+    def owner_of(self, prompt_id):
+        return self._owners.get(prompt_id)
+
+    def backend_of(self, prompt_id):
+        client = self._owners.get(prompt_id)
+        return client.base_url if client is not None else None
+
+    def is_healthy(self, client):
+        """False while client is skipped after failing to answer a poll."""
+        return self._unhealthy_until[client] <= time.monotonic()
+
+    async def pick_backend(self, candidates=None):
+        """Returns the healthy backend with the lowest weighted queue length."""
+        candidates = list(candidates) if candidates is not None else self.clients
+        now = time.monotonic()
+        polled = [c for c in candidates if self._unhealthy_until[c] <= now]
+        if not polled:
+            # Everything is cooling down; better to retry than to refuse outright
+            polled = candidates
+
+        loads = await asyncio.gather(*(client.get_queue_load_async() for client in polled))
+
+        best = None
+        best_score = None
+        for client, load in zip(polled, loads):
+            if load is None:
+                self._unhealthy_until[client] = now + UNHEALTHY_COOLDOWN
+                continue
+            self._unhealthy_until[client] = 0.0
+            # Prompts being submitted right now are not in /queue yet
+            score = (load + self._reserved[client]) / self.weights[client]
+            if best is None or score < best_score:
+                best = client
+                best_score = score
+
+        if best is None:
+            raise ConnectionError("No healthy ComfyUI backend available")
+        return best
+
+    async def queue_prompt(self, workflow, candidates=None):
+        client = await self.pick_backend(candidates)
+        self._reserved[client] += 1
+        try:
+            prompt_id = await client.queue_prompt(workflow)
+        finally:
+            self._reserved[client] -= 1
+        self._owners[prompt_id] = client
+        return prompt_id
+
+    async def stream_prompt(self, prompt_id):
+        client = self._owners[prompt_id]
+        try:
+            async with contextlib.aclosing(client.stream_prompt(prompt_id)) as events:
+                async for event in events:
+                    yield event
+        finally:
+            self._owners.pop(prompt_id, None)
+
+    async def generate_image(self, workflow):
+        prompt_id = await self.queue_prompt(workflow)
+        yield {"type": "queued", "prompt_id": prompt_id}
+        async with contextlib.aclosing(self.stream_prompt(prompt_id)) as events:
+            async for event in events:
+                yield event
+
+    async def delete_queued(self, prompt_ids):
+        by_client = {}
+        for prompt_id in prompt_ids:
+            client = self._owners.pop(prompt_id, None)
+            if client is not None:
+                by_client.setdefault(client, []).append(prompt_id)
+        await asyncio.gather(*(client.delete_queued(ids) for client, ids in by_client.items()))
+
+    async def cancel_prompts(self, prompt_ids):
+        by_client = {}
+        for prompt_id in prompt_ids:
+            client = self._owners.pop(prompt_id, None)
+            if client is None:
+                # Ownership is dropped once a stream closes; let each backend check its queue
+                for other in self.clients:
+                    by_client.setdefault(other, []).append(prompt_id)
+            else:
+                by_client.setdefault(client, []).append(prompt_id)
+        await asyncio.gather(*(client.cancel_prompts(ids) for client, ids in by_client.items()))
+
+    def find_node_by_title(self, workflow, title):
+        return self.clients[0].find_node_by_title(workflow, title)
+
+    def inject_prompt(self, workflow, prompt_text):
+        return self.clients[0].inject_prompt(workflow, prompt_text)
+
+    def check_connection(self):
+        return any(client.check_connection() for client in self.clients)
+
+    def get_object_info(self):
+        # Backends are expected to run the same nodes; use the first one that answers
+        for client in self.clients:
+            object_info = client.get_object_info()
+            if object_info:
+                return object_info
+        return {}
+
+    def get_node_info(self, class_type):
+        for client in self.clients:
+            node_info = client.get_node_info(class_type)
+            if node_info:
+                return node_info
+        return {}
+
+    def get_object_info_for(self, class_types):
+        for client in self.clients:
+            object_info = client.get_object_info_for(class_types)
+            if object_info:
+                return object_info
+        return {}
+
+    async def aclose(self):
+        await asyncio.gather(*(client.aclose() for client in self.clients))
@@ -7,20 +7,108 @@ DEFAULT_SLIDERS = {
     "denoise": {"min": 0.0, "max": 1.0, "step": 0.01},
 }
 
+# Number of batch items kept queued on ComfyUI ahead of the one being streamed.
+DEFAULT_PIPELINE_DEPTH = 2
+
+# Generate runs Gradio executes at once across all sessions (None means unlimited).
+# The job scheduler decides what reaches ComfyUI, so Gradio need not serialize runs.
+DEFAULT_CONCURRENCY_LIMIT = None
+
+# Prompts the job scheduler keeps queued or running on each backend.
+DEFAULT_MAX_IN_FLIGHT = 3
+
+# How many of those may come from multi-image batches: one running plus the next
+# one queued behind it, so the GPU never waits for SimplUI between items.
+DEFAULT_MAX_BULK_IN_FLIGHT = 2
+
+# Progress updates sent to the browser per second at most, per image (0 means unlimited).
+DEFAULT_MAX_PROGRESS_HZ = 10
+
+# Images kept in a session's history gallery, oldest dropped first (0 means unlimited).
+DEFAULT_HISTORY_LIMIT = 500
+
+# Megabytes of image data buffered in memory across all sessions before spilling to disk.
+DEFAULT_IMAGE_MEMORY_MB = 512
+
+# Megabytes of final images kept in Gradio's cache for the galleries; the oldest are
+# deleted beyond that.
+DEFAULT_OUTPUT_CACHE_MB = 2048
+
+# Seconds a preview frame stays on disk after it was last sent, for slow browsers.
+DEFAULT_PREVIEW_MAX_AGE = 300
+
+# Where a copy of every final image is kept, with its prompt and seeds (None disables it).
+DEFAULT_ARCHIVE_DIR = "outputs"
+
+# SQLite database recording every final image, for the History tab (None disables it).
+DEFAULT_HISTORY_DB = "history.sqlite3"
+
+# Where SimplUI keeps files between runs, relative to the working directory.
+DEFAULT_CACHE_DIR = "cache"
+
+# How finished batch items are ordered in the gallery.
+BATCH_ORDERS = ("batch", "completion")
+
 
 class ConfigManager:
     def __init__(self, config_path):
         self.config_path = config_path
         self.comfy_url = ""
+        self.backends = []
         self.workflows = []
         self.sliders = copy.deepcopy(DEFAULT_SLIDERS)
+        self.pipeline_depth = DEFAULT_PIPELINE_DEPTH
+        self.distribute_batches = False
+        self.batch_order = "batch"
+        self.concurrency_limit = DEFAULT_CONCURRENCY_LIMIT
+        self.max_in_flight = DEFAULT_MAX_IN_FLIGHT
+        self.max_bulk_in_flight = DEFAULT_MAX_BULK_IN_FLIGHT
+        self.max_progress_hz = DEFAULT_MAX_PROGRESS_HZ
+        self.history_limit = DEFAULT_HISTORY_LIMIT
+        self.image_memory_mb = DEFAULT_IMAGE_MEMORY_MB
+        self.output_cache_mb = DEFAULT_OUTPUT_CACHE_MB
+        self.preview_max_age = DEFAULT_PREVIEW_MAX_AGE
+        self.archive_dir = DEFAULT_ARCHIVE_DIR
+        self.history_db = DEFAULT_HISTORY_DB
+        self.shared_history = False
+        self.cache_dir = DEFAULT_CACHE_DIR
         self._load()
 
     def _load(self):
         with open(self.config_path, "r") as f:
             data = json.load(f)
             self.comfy_url = data.get("comfy_url", "")
+            self.backends = self._parse_backends(data.get("backends", []))
+            if not self.backends and self.comfy_url:
+                self.backends = [{"url": self.comfy_url, "weight": 1}]
+            if not self.comfy_url and self.backends:
+                self.comfy_url = self.backends[0]["url"]
             self.workflows = data.get("workflows", [])
+            self.pipeline_depth = max(1, int(data.get("pipeline_depth", DEFAULT_PIPELINE_DEPTH)))
+            self.distribute_batches = bool(data.get("distribute_batches", False))
+            self.batch_order = data.get("batch_order", "batch")
+            if self.batch_order not in BATCH_ORDERS:
+                raise ValueError(f"batch_order must be one of {BATCH_ORDERS}")
+            self.concurrency_limit = data.get("concurrency_limit", DEFAULT_CONCURRENCY_LIMIT)
+            self.max_in_flight = max(1, int(data.get("max_in_flight", DEFAULT_MAX_IN_FLIGHT)))
+            self.max_bulk_in_flight = max(
+                1, int(data.get("max_bulk_in_flight", DEFAULT_MAX_BULK_IN_FLIGHT))
+            )
+            self.max_progress_hz = max(
+                0, float(data.get("max_progress_hz", DEFAULT_MAX_PROGRESS_HZ))
+            )
+            self.history_limit = max(0, int(data.get("history_limit", DEFAULT_HISTORY_LIMIT)))
+            self.image_memory_mb = max(1, int(data.get("image_memory_mb", DEFAULT_IMAGE_MEMORY_MB)))
+            self.output_cache_mb = max(1, int(data.get("output_cache_mb", DEFAULT_OUTPUT_CACHE_MB)))
+            self.preview_max_age = max(
+                0, float(data.get("preview_max_age", DEFAULT_PREVIEW_MAX_AGE))
+            )
+            self.archive_dir = data.get("archive_dir", DEFAULT_ARCHIVE_DIR)
+            self.history_db = data.get("history_db", DEFAULT_HISTORY_DB)
+            # Everyone sees everyone's images in the History tab. Otherwise users see
+            # their own, or without auth those made in the same browser.
+            self.shared_history = bool(data.get("shared_history", False))
+            self.cache_dir = data.get("cache_dir", DEFAULT_CACHE_DIR)
 
             overrides = data.get("slider_overrides", {})
             for key, val in overrides.items():
@@ -28,3 +116,16 @@ class ConfigManager:
                     self.sliders[key].update(val)
                 else:
                     self.sliders[key] = val
+
+    @staticmethod
+    def _parse_backends(entries):
+        backends = []
+        for entry in entries:
+            # Plain URL strings are shorthand for a backend with weight 1
+            if isinstance(entry, str):
+                entry = {"url": entry}
+            weight = entry.get("weight", 1)
+            if weight <= 0:
+                raise ValueError(f"Backend weight must be positive: {entry['url']}")
+            backends.append({"url": entry["url"], "weight": weight})
+        return backends
@@ -0,0 +1,194 @@
+import asyncio
+import collections
+import contextlib
+import time
+
+try:
+    from .config_manager import DEFAULT_MAX_PROGRESS_HZ
+except ImportError:
+    from config_manager import DEFAULT_MAX_PROGRESS_HZ
+
+# Events that are never dropped (queued, images) buffered before the reader waits.
+CHANNEL_SIZE = 8
+
+# Event types where only the newest one still waiting to be shown matters
+LATEST_WINS = ("preview", "progress", "waiting")
+
+# Keeps spills in progress alive until they finish
+_spills = set()
+
+
+class LatestWinsChannel:
+    """Buffers one stream's events between the reader and the UI generator.
+
+    Previews, progress and queue positions replace older events of the same
+    type that have not been taken yet, so a slow consumer skips straight to the
+    newest frame instead of working through a backlog, and skipped previews are
+    never decoded. A final image also replaces the preview and progress queued
+    before it. Progress goes out at most max_progress_hz times per second; the
+    newest held back update is sent once the interval has passed.
+
+    With an ImageMemory, buffered image bytes count against its budget. Evicted
+    previews are dropped and evicted final images are spilled to disk on a worker
+    thread, which turns their data into a path. Another stream's put() can evict
+    this one's images, so the write never runs on the event loop.
+    """
+
+    def __init__(self, max_progress_hz=DEFAULT_MAX_PROGRESS_HZ, size=CHANNEL_SIZE, memory=None):
+        self._memory = memory
+        # id(event) -> ImageMemory token of the image bytes it holds
+        self._held = {}
+        self._interval = 1 / max_progress_hz if max_progress_hz else 0
+        self._size = size
+        self._pending = collections.deque()
+        # Events in _pending that may not be dropped
+        self._kept = 0
+        self._next_progress = 0.0
+        self._closed = False
+        self._error = None
+        self._ready = asyncio.Event()
+        self._room = asyncio.Event()
+        self.dropped = 0
+
+    def _drop(self, types):
+        kept = []
+        for event in self._pending:
+            if event.get("type") in types:
+                self._release(event)
+            else:
+                kept.append(event)
+        self.dropped += len(self._pending) - len(kept)
+        self._pending = collections.deque(kept)
+
+    def _hold(self, event):
+        if self._memory is None or event.get("data") is None:
+            return
+        key = id(event)
+        # Cleared again if the event is evicted before hold() returns
+        self._held[key] = None
+        token = self._memory.hold(len(event["data"]), lambda: self._evict(event))
+        if key in self._held:
+            self._held[key] = token
+
+    def _release(self, event):
+        token = self._held.pop(id(event), None)
+        if token is not None:
+            self._memory.release(token)
+
+    def _evict(self, event):
+        self._held.pop(id(event), None)
+        if event.get("type") == "image" and self._memory.spill is not None:
+            spill = asyncio.ensure_future(self._spill(event))
+            _spills.add(spill)
+            spill.add_done_callback(_spills.discard)
+            return
+        for i, pending in enumerate(self._pending):
+            if pending is event:
+                del self._pending[i]
+                if event.get("type") not in LATEST_WINS:
+                    self._kept -= 1
+                    self._room.set()
+                self.dropped += 1
+                return
+
+    async def _spill(self, event):
+        data = event["data"]
+        try:
+            path = await asyncio.to_thread(self._memory.spill, data)
+        except OSError as e:
+            # Final images are never dropped; this one stays in memory, uncounted
+            print(f"Warning: Could not spill image to disk: {e}")
+            return
+        # Whoever took the event in the meantime already has the data
+        event["path"] = path
+        event.pop("data", None)
+
+    def release_all(self):
+        for event in self._pending:
+            self._release(event)
+
+    async def put(self, event):
+        event_type = event.get("type")
+        if event_type in LATEST_WINS:
+            self._drop((event_type,))
+        else:
+            while self._kept >= self._size:
+                self._room.clear()
+                await self._room.wait()
+            if event_type == "image":
+                self._drop(("preview", "progress"))
+            self._kept += 1
+        self._pending.append(event)
+        self._hold(event)
+        self._ready.set()
+
+    def close(self, error=None):
+        self._closed = True
+        self._error = error
+        self._ready.set()
+
+    async def fill(self, events):
+        """Reads events into the channel until the stream ends, then closes it."""
+        try:
+            async with contextlib.aclosing(events):
+                async for event in events:
+                    await self.put(event)
+                    # Let the consumer take it before reading on, so frames are only
+                    # dropped when the consumer is really behind
+                    await asyncio.sleep(0)
+        except Exception as e:
+            self.close(e)
+        else:
+            self.close()
+
+    def _take(self, now):
+        for i, event in enumerate(self._pending):
+            # Progress waits out the rate limit, but nothing is held back at the end
+            if event.get("type") == "progress" and now < self._next_progress and not self._closed:
+                continue
+            del self._pending[i]
+            self._release(event)
+            if event.get("type") == "progress":
+                self._next_progress = now + self._interval
+            elif event.get("type") not in LATEST_WINS:
+                self._kept -= 1
+                self._room.set()
+            return event
+        return None
+
+    async def get(self):
+        """Returns the next event to show, or None once the stream has ended."""
+        while True:
+            now = time.monotonic()
+            event = self._take(now)
+            if event is not None:
+                return event
+            if self._closed:
+                if self._error is not None:
+                    raise self._error
+                return None
+            self._ready.clear()
+            # Only held back progress can be pending here; wake up when it is due
+            due = None
+            if self._pending:
+                loop = asyncio.get_running_loop()
+                due = loop.call_later(self._next_progress - now, self._ready.set)
+            try:
+                await self._ready.wait()
+            finally:
+                if due is not None:
+                    due.cancel()
+
+
+async def coalesce_events(events, max_progress_hz=DEFAULT_MAX_PROGRESS_HZ, memory=None):
+    """Yields events through a LatestWinsChannel read by a separate task."""
+    channel = LatestWinsChannel(max_progress_hz, memory=memory)
+    reader = asyncio.create_task(channel.fill(events))
+    try:
+        while (event := await channel.get()) is not None:
+            yield event
+    finally:
+        reader.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await reader
+        channel.release_all()
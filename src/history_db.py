@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import threading
+
+# Images returned per page of the History tab.
+HISTORY_PAGE_SIZE = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    owner TEXT,
+    workflow_name TEXT,
+    prompt TEXT,
+    seeds TEXT,
+    overrides TEXT,
+    backend TEXT,
+    duration REAL,
+    path TEXT NOT NULL,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS images_by_time ON images (created, id);
+CREATE INDEX IF NOT EXISTS images_by_owner ON images (owner, created, id);
+CREATE INDEX IF NOT EXISTS images_by_workflow ON images (workflow_name, created, id);
+"""
+
+
+class HistoryDB:
+    """Every final image ever generated, one row each, newest first.
+
+    Pages are fetched with a keyset cursor, the (created, id) of the last row
+    shown, so any page costs the same index range scan however large the
+    history grows.
+    """
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Gradio calls in from its worker threads; sqlite3 objects must not be shared
+        # between them unguarded
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL keeps readers off the writer's back and commits without an fsync each
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def add(
+        self,
+        images,
+        created,
+        owner=None,
+        workflow_name=None,
+        prompt=None,
+        seeds=None,
+        overrides=None,
+        backend=None,
+        duration=None,
+    ):
+        """Records images, a list of (path, source) made by one batch item."""
+        rows = [
+            (
+                created,
+                owner,
+                workflow_name,
+                prompt,
+                json.dumps(seeds or {}),
+                json.dumps(overrides or {}),
+                backend,
+                duration,
+                path,
+                source,
+            )
+            for path, source in images
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO images (created, owner, workflow_name, prompt, seeds, overrides,"
+                " backend, duration, path, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def page(self, owner=None, workflow_name=None, cursor=None, limit=HISTORY_PAGE_SIZE):
+        """Returns up to limit rows older than cursor, and the cursor for the next page.
+
+        The next cursor is None when there is nothing older.
+        """
+        clauses = []
+        params = []
+        if owner is not None:
+            clauses.append("owner = ?")
+            params.append(owner)
+        if workflow_name is not None:
+            clauses.append("workflow_name = ?")
+            params.append(workflow_name)
+        if cursor is not None:
+            clauses.append("(created, id) < (?, ?)")
+            params.extend(cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM images {where} ORDER BY created DESC, id DESC LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+        rows = [dict(row) for row in rows]
+        for row in rows:
+            row["seeds"] = json.loads(row["seeds"])
+            row["overrides"] = json.loads(row["overrides"])
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, (rows[-1]["created"], rows[-1]["id"])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,44 @@
+import collections
+import itertools
+
+
+class ImageMemory:
+    """Process-wide account of image bytes waiting between ComfyUI and the gallery.
+
+    Buffers hold() what they keep and release() it once it is gone. When the
+    total goes over budget, the oldest entries are evicted through the callback
+    given with them, which must free the bytes, by dropping a preview or by
+    writing a final image to disk with spill().
+    """
+
+    def __init__(self, budget_bytes, spill=None):
+        self.budget_bytes = budget_bytes
+        self.spill = spill
+        self.used_bytes = 0
+        self.evicted = 0
+        self._entries = collections.OrderedDict()
+        self._tokens = itertools.count()
+
+    def hold(self, size, evict):
+        token = next(self._tokens)
+        self._entries[token] = (size, evict)
+        self.used_bytes += size
+        while self.used_bytes > self.budget_bytes and self._entries:
+            _, (evicted_size, evict_entry) = self._entries.popitem(last=False)
+            self.used_bytes -= evicted_size
+            self.evicted += 1
+            evict_entry()
+        return token
+
+    def release(self, token):
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            self.used_bytes -= entry[0]
+
+    def usage(self):
+        return {
+            "used_bytes": self.used_bytes,
+            "budget_bytes": self.budget_bytes,
+            "entries": len(self._entries),
+            "evicted": self.evicted,
+        }
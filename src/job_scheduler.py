@@ -0,0 +1,358 @@
+import asyncio
+import collections
+import contextlib
+import itertools
+import uuid
+
+try:
+    from .comfy_pool import ComfyPool
+    from .config_manager import DEFAULT_MAX_BULK_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT
+    from .event_channel import LatestWinsChannel
+    from .session_registry import cancel_prompts_in_background
+except ImportError:
+    from comfy_pool import ComfyPool
+    from config_manager import DEFAULT_MAX_BULK_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT
+    from event_channel import LatestWinsChannel
+    from session_registry import cancel_prompts_in_background
+
+# Finished jobs whose backend is still remembered for backend_of.
+RECENT_PLACEMENTS = 1024
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+# Lanes in admission order
+PRIORITIES = (INTERACTIVE, BULK)
+
+
+class _Job:
+    def __init__(self, owner, workflow, priority, memory=None):
+        self.id = f"job-{uuid.uuid4()}"
+        self.owner = owner
+        self.workflow = workflow
+        self.priority = priority
+        self.backend = None
+        self.prompt_id = None
+        self.task = None
+        self.cancelled = False
+        # Pipelined items run ahead of the one on screen; their previews collapse to
+        # the newest and their images count against the shared image memory. The
+        # consumer applies the progress rate limit.
+        self.events = LatestWinsChannel(max_progress_hz=0, memory=memory)
+
+
+class JobScheduler:
+    """Holds prompts inside SimplUI and admits them to ComfyUI fairly across sessions.
+
+    Interactive jobs are always admitted before bulk ones. Within a lane the next job
+    comes from the owner with the fewest jobs admitted, so one long batch cannot
+    starve other sessions. Each backend gets at most max_in_flight prompts, of which
+    at most max_bulk_in_flight may be bulk. cancel_prompts takes scheduler job ids;
+    every other attribute is delegated to the wrapped client.
+    """
+
+    def __init__(
+        self,
+        comfy_client,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        max_bulk_in_flight=DEFAULT_MAX_BULK_IN_FLIGHT,
+        memory=None,
+    ):
+        self.comfy_client = comfy_client
+        self.max_in_flight = max_in_flight
+        self.max_bulk_in_flight = max_bulk_in_flight
+        # ImageMemory that events buffered for jobs count against
+        self.memory = memory
+        if isinstance(comfy_client, ComfyPool):
+            self.backends = list(comfy_client.clients)
+        else:
+            self.backends = [comfy_client]
+        self._in_flight = {backend: 0 for backend in self.backends}
+        self._bulk_in_flight = {backend: 0 for backend in self.backends}
+        # Admitted jobs per lane, including those still being placed on a backend
+        self._admitted = collections.Counter()
+        # Admitted jobs per owner; the owner with the fewest goes next
+        self._owner_admitted = collections.Counter()
+        # Ties go to whoever was served least recently
+        self._last_served = {}
+        self._ticks = itertools.count()
+        # priority -> owner -> deque of waiting jobs
+        self._waiting = {priority: {} for priority in PRIORITIES}
+        self._jobs = {}
+        # job id -> base_url of the backend it ran on, newest last
+        self._placements = collections.OrderedDict()
+        self._placement_lock = asyncio.Lock()
+        self._changed = asyncio.Event()
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self.comfy_client, name)
+
+    def for_owner(self, owner, priority=INTERACTIVE):
+        return ScheduledClient(self, owner, priority)
+
+    def forget(self, owner):
+        """Drops the fairness history of an owner that has gone away."""
+        self._last_served.pop(owner, None)
+
+    def in_flight(self):
+        return dict(self._in_flight)
+
+    def waiting_count(self, priority=None):
+        priorities = PRIORITIES if priority is None else (priority,)
+        return sum(len(jobs) for p in priorities for jobs in self._waiting[p].values())
+
+    def _notify(self):
+        # Wake everyone watching their queue position, then start a fresh round
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _healthy_backends(self):
+        if not isinstance(self.comfy_client, ComfyPool):
+            return self.backends
+        return [b for b in self.backends if self.comfy_client.is_healthy(b)]
+
+    def _usable_backends(self):
+        # With every backend down, keep trying them all rather than refusing outright
+        return self._healthy_backends() or self.backends
+
+    def _has_room(self, backend, priority):
+        if self._in_flight[backend] >= self.max_in_flight:
+            return False
+        return priority != BULK or self._bulk_in_flight[backend] < self.max_bulk_in_flight
+
+    def _lane_open(self, priority):
+        backends = self._usable_backends()
+        if sum(self._admitted.values()) >= self.max_in_flight * len(backends):
+            return False
+        if priority == BULK and self._admitted[BULK] >= self.max_bulk_in_flight * len(backends):
+            return False
+        return any(self._has_room(backend, priority) for backend in backends)
+
+    def _take_next(self, waiting, admitted, last_served):
+        owner = min(waiting, key=lambda o: (admitted[o], last_served.get(o, -1)))
+        jobs = waiting[owner]
+        job = jobs.popleft()
+        if not jobs:
+            del waiting[owner]
+        admitted[owner] += 1
+        last_served[owner] = next(self._ticks)
+        return job
+
+    def _admission_order(self):
+        # Replays _dispatch on copies, assuming nothing finishes in the meantime
+        admitted = collections.Counter(self._owner_admitted)
+        last_served = dict(self._last_served)
+        order = []
+        for priority in PRIORITIES:
+            waiting = {
+                owner: collections.deque(jobs) for owner, jobs in self._waiting[priority].items()
+            }
+            while waiting:
+                order.append(self._take_next(waiting, admitted, last_served))
+        return order
+
+    def position(self, job_id):
+        """Returns the 1-based admission position of a waiting job, or 0 once admitted."""
+        job = self._jobs.get(job_id)
+        if job is None or job.task is not None:
+            return 0
+        return self._admission_order().index(job) + 1
+
+    def submit(self, workflow, owner, priority=INTERACTIVE):
+        if priority not in PRIORITIES:
+            raise ValueError(f"priority must be one of {PRIORITIES}")
+        job = _Job(owner, workflow, priority, self.memory)
+        self._jobs[job.id] = job
+        self._waiting[priority].setdefault(owner, collections.deque()).append(job)
+        self._dispatch()
+        return job.id
+
+    def _dispatch(self):
+        for priority in PRIORITIES:
+            waiting = self._waiting[priority]
+            while waiting and self._lane_open(priority):
+                job = self._take_next(waiting, self._owner_admitted, self._last_served)
+                self._admitted[priority] += 1
+                job.task = asyncio.create_task(self._run(job))
+        self._notify()
+
+    def _unadmit(self, job):
+        self._admitted[job.priority] -= 1
+        self._owner_admitted[job.owner] -= 1
+        if not self._owner_admitted[job.owner]:
+            del self._owner_admitted[job.owner]
+
+    def _requeue(self, job):
+        # Wait at the front of the line for the next release
+        job.task = None
+        self._waiting[job.priority].setdefault(job.owner, collections.deque()).appendleft(job)
+
+    async def _run(self, job):
+        requeued = False
+        try:
+            async with self._placement_lock:
+                free = [b for b in self._usable_backends() if self._has_room(b, job.priority)]
+                if not free:
+                    # An earlier placement took the last slot this lane may use
+                    requeued = True
+                    self._requeue(job)
+                    return
+                if isinstance(self.comfy_client, ComfyPool):
+                    try:
+                        backend = await self.comfy_client.pick_backend(free)
+                    except ConnectionError:
+                        if not self._healthy_backends():
+                            raise
+                        # Only the backends with room were down; the healthy ones
+                        # will take the job once they release a slot
+                        requeued = True
+                        self._requeue(job)
+                        return
+                else:
+                    backend = free[0]
+                self._in_flight[backend] += 1
+                if job.priority == BULK:
+                    self._bulk_in_flight[backend] += 1
+                job.backend = backend
+                self._placements[job.id] = backend.base_url
+                while len(self._placements) > RECENT_PLACEMENTS:
+                    self._placements.popitem(last=False)
+
+            submission = asyncio.ensure_future(backend.queue_prompt(job.workflow))
+            try:
+                job.prompt_id = await asyncio.shield(submission)
+            except asyncio.CancelledError:
+                cancel_prompts_in_background(backend, [], [submission])
+                raise
+            async with contextlib.aclosing(backend.stream_prompt(job.prompt_id)) as events:
+                async for event in events:
+                    await job.events.put(event)
+            job.events.close()
+        except asyncio.CancelledError:
+            job.events.close()
+            raise
+        except Exception as e:
+            job.events.close(e)
+        finally:
+            if job.cancelled:
+                # Nobody will read what is left
+                job.events.release_all()
+            if job.backend is not None:
+                self._in_flight[job.backend] -= 1
+                if job.priority == BULK:
+                    self._bulk_in_flight[job.backend] -= 1
+            self._unadmit(job)
+            if requeued:
+                self._notify()
+            elif not self._closed:
+                self._dispatch()
+
+    async def stream(self, job_id):
+        job = self._jobs[job_id]
+        finished = False
+        try:
+            last_position = None
+            while job.task is None and not job.cancelled:
+                position = self.position(job_id)
+                if position != last_position:
+                    yield {"type": "waiting", "position": position}
+                    last_position = position
+                await self._changed.wait()
+
+            while (event := await job.events.get()) is not None:
+                yield event
+            finished = True
+        finally:
+            job.events.release_all()
+            if finished:
+                self._jobs.pop(job_id, None)
+            else:
+                # Never awaits, so it is safe while this generator is being cancelled
+                self._cancel([job_id])
+
+    def backend_of(self, job_id):
+        """base_url of the backend a job was placed on, None if unknown."""
+        return self._placements.get(job_id)
+
+    async def cancel(self, job_ids):
+        self._cancel(job_ids)
+
+    def _cancel(self, job_ids):
+        to_cancel = []
+        for job_id in job_ids:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                continue
+            job.cancelled = True
+            if job.task is None:
+                waiting = self._waiting[job.priority]
+                jobs = waiting.get(job.owner)
+                if jobs is not None and job in jobs:
+                    jobs.remove(job)
+                    if not jobs:
+                        del waiting[job.owner]
+                job.events.close()
+            else:
+                to_cancel.append(job)
+        self._notify()
+
+        for job in to_cancel:
+            job.events.release_all()
+            if job.prompt_id is not None:
+                cancel_prompts_in_background(job.backend, [job.prompt_id])
+            job.task.cancel()
+
+    async def cancel_prompts(self, job_ids):
+        await self.cancel(job_ids)
+
+    async def delete_queued(self, job_ids):
+        await self.cancel(job_ids)
+
+    async def aclose(self):
+        self._closed = True
+        for waiting in self._waiting.values():
+            waiting.clear()
+        tasks = [job.task for job in self._jobs.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._jobs.clear()
+        await self.comfy_client.aclose()
+
+
+class ScheduledClient:
+    """Client interface that submits through a JobScheduler on behalf of one owner.
+
+    prompt_ids handed out here are scheduler job ids, which stay valid while a job
+    waits in SimplUI and after it reaches ComfyUI.
+    """
+
+    def __init__(self, scheduler, owner, priority=INTERACTIVE):
+        self.scheduler = scheduler
+        self.owner = owner
+        self.priority = priority
+
+    def __getattr__(self, name):
+        return getattr(self.scheduler.comfy_client, name)
+
+    async def queue_prompt(self, workflow):
+        return self.scheduler.submit(workflow, self.owner, self.priority)
+
+    def stream_prompt(self, job_id):
+        return self.scheduler.stream(job_id)
+
+    def backend_of(self, job_id):
+        return self.scheduler.backend_of(job_id)
+
+    async def generate_image(self, workflow):
+        job_id = await self.queue_prompt(workflow)
+        yield {"type": "queued", "prompt_id": job_id}
+        async with contextlib.aclosing(self.stream_prompt(job_id)) as events:
+            async for event in events:
+                yield event
+
+    async def cancel_prompts(self, job_ids):
+        await self.scheduler.cancel(job_ids)
+
+    async def delete_queued(self, job_ids):
+        await self.scheduler.cancel(job_ids)
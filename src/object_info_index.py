@@ -0,0 +1,228 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Seconds between attempts to fetch object_info while ComfyUI is not answering.
+REFRESH_RETRY_INTERVAL = 30
+
+# Seconds between refreshes once it has answered, so new models and nodes show up.
+REFRESH_INTERVAL = 300
+
+# kind is "enum", "number" (with a min/max range) or None when ComfyUI gives no hint
+InputSpec = collections.namedtuple(
+    "InputSpec", ["kind", "options", "min", "max", "step", "default"]
+)
+
+
+def _input_spec(input_def):
+    if not input_def:
+        return None
+    if not isinstance(input_def, list):
+        return InputSpec(None, None, None, None, None, None)
+    meta = input_def[1] if len(input_def) > 1 and isinstance(input_def[1], dict) else {}
+    default = meta.get("default")
+    if isinstance(input_def[0], list):
+        return InputSpec("enum", tuple(input_def[0]), None, None, None, default)
+    if "min" in meta and "max" in meta:
+        return InputSpec("number", None, meta["min"], meta["max"], meta.get("step"), default)
+    return InputSpec(None, None, None, None, None, default)
+
+
+class ObjectInfoIndex:
+    """Input specs from /object_info, looked up by (class_type, input_name).
+
+    Built from the raw response, which can be dropped afterwards. With a loader,
+    which takes a list of classes and returns their object_info, classes that were
+    not fetched up front are fetched on first lookup, or ahead of it with fetch().
+    Classes the loader gives nothing for are tried again after
+    REFRESH_RETRY_INTERVAL. The loader blocks, so coroutines call fetch() in a
+    thread first. version goes up whenever the specs change.
+    """
+
+    def __init__(self, specs=None, loader=None):
+        self._specs = specs or {}
+        self.loader = loader
+        self.version = 0
+        # Lazy fetches and the background refresh both rebuild the specs
+        self._lock = threading.Lock()
+        # Classes already fetched
+        self._classes = {class_type for class_type, _ in self._specs}
+        # class_type -> time.monotonic() before which an empty fetch is not repeated
+        self._retry_at = {}
+
+    @staticmethod
+    def _index(object_info, specs):
+        for class_type, node_def in object_info.items():
+            node_inputs = node_def.get("input", {}) if isinstance(node_def, dict) else {}
+            # Required inputs win over optional ones with the same name
+            for section in ("optional", "required"):
+                for name, input_def in (node_inputs.get(section) or {}).items():
+                    spec = _input_spec(input_def)
+                    if spec is not None:
+                        specs[(class_type, name)] = spec
+
+    @classmethod
+    def from_object_info(cls, object_info, loader=None, class_types=()):
+        index = cls(loader=loader)
+        index.add(object_info, class_types)
+        return index
+
+    def add(self, object_info, class_types=()):
+        """Indexes more node definitions; class_types marks classes as fetched.
+
+        Definitions replace whatever was indexed for the same classes before.
+        """
+        with self._lock:
+            self._classes.update(class_types)
+            if not isinstance(object_info, dict):
+                # Nothing usable came back from ComfyUI
+                return
+            # Build aside and swap, so lookups never see a partial index
+            specs = {key: spec for key, spec in self._specs.items() if key[0] not in object_info}
+            self._index(object_info, specs)
+            self._classes.update(object_info)
+            # A refresh that changes nothing keeps cached extractions valid
+            if specs != self._specs:
+                self._specs = specs
+                self.version += 1
+
+    def classes(self):
+        """The classes fetched so far."""
+        with self._lock:
+            return set(self._classes)
+
+    def missing(self, class_types):
+        """The classes among class_types that the loader would still have to fetch."""
+        if self.loader is None:
+            return []
+        now = time.monotonic()
+        return [
+            class_type
+            for class_type in class_types
+            if class_type not in self._classes and self._retry_at.get(class_type, 0) <= now
+        ]
+
+    def fetch(self, class_types):
+        """Loads the missing classes among class_types in one call to the loader."""
+        class_types = self.missing(class_types)
+        if not class_types:
+            return
+        object_info = self.loader(class_types)
+        if not isinstance(object_info, dict):
+            object_info = {}
+        # Only what came back counts as fetched; ComfyUI may be down or still loading
+        retry_at = time.monotonic() + REFRESH_RETRY_INTERVAL
+        for class_type in class_types:
+            if class_type not in object_info:
+                self._retry_at[class_type] = retry_at
+        if object_info:
+            self.add(object_info)
+
+    def __len__(self):
+        return len(self._specs)
+
+    def __bool__(self):
+        return bool(self._specs) or self.loader is not None
+
+    def get(self, class_type, input_name):
+        if class_type not in self._classes:
+            self.fetch((class_type,))
+        return self._specs.get((class_type, input_name))
+
+
+class ObjectInfoSnapshot:
+    """Node definitions of one backend, saved on disk so startup need not wait for it."""
+
+    def __init__(self, cache_dir, base_url):
+        digest = hashlib.sha256(base_url.encode()).hexdigest()[:16]
+        self.path = os.path.join(cache_dir, f"object_info-{digest}.json")
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                object_info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return object_info if isinstance(object_info, dict) else None
+
+    def save(self, object_info):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write aside and rename, so a crash never leaves a truncated snapshot
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(object_info, f)
+        os.replace(temp_path, self.path)
+
+
+def workflow_class_types(workflows):
+    class_types = set()
+    for workflow in workflows:
+        for node in workflow.values():
+            if isinstance(node, dict) and node.get("class_type"):
+                class_types.add(node["class_type"])
+    return sorted(class_types)
+
+
+def refresh_object_info_index(index, comfy_client, class_types, snapshot=None):
+    """Re-fetches the given classes into index; returns False if ComfyUI gave nothing.
+
+    Falls back to the full /object_info listing when ComfyUI cannot answer
+    per-class requests.
+    """
+    object_info = comfy_client.get_object_info_for(class_types) if class_types else {}
+    if isinstance(object_info, dict) and object_info:
+        index.loader = comfy_client.get_object_info_for
+    else:
+        object_info = comfy_client.get_object_info()
+        if not isinstance(object_info, dict) or not object_info:
+            return False
+        index.loader = None
+    index.add(object_info)
+    if snapshot is not None:
+        try:
+            snapshot.save({c: object_info[c] for c in class_types if c in object_info})
+        except OSError as e:
+            print(f"Warning: Could not save object_info snapshot: {e}")
+    return True
+
+
+def _keep_refreshed(index, comfy_client, class_types, snapshot, delay=0):
+    while True:
+        time.sleep(delay)
+        # Classes fetched lazily since are refreshed too
+        wanted = sorted(index.classes().union(class_types))
+        if refresh_object_info_index(index, comfy_client, wanted, snapshot):
+            delay = REFRESH_INTERVAL
+        else:
+            delay = REFRESH_RETRY_INTERVAL
+
+
+def load_object_info_index(comfy_client, workflows, snapshot=None, block=True):
+    """Fetches definitions for the node classes the workflows use, the rest lazily.
+
+    With a snapshot on disk the index is served from it right away and refreshed
+    in the background. Without one the first fetch happens here, unless block is
+    False; if ComfyUI does not answer, it is retried in the background until it does.
+    After that the index is refreshed every REFRESH_INTERVAL seconds, so models and
+    nodes added to ComfyUI show up without restarting SimplUI.
+    """
+    class_types = workflow_class_types(workflows)
+    index = ObjectInfoIndex()
+    cached = snapshot.load() if snapshot is not None else None
+    delay = 0
+    if cached:
+        index.loader = comfy_client.get_object_info_for
+        index.add(cached)
+    elif block and refresh_object_info_index(index, comfy_client, class_types, snapshot):
+        delay = REFRESH_INTERVAL
+
+    threading.Thread(
+        target=_keep_refreshed,
+        args=(index, comfy_client, class_types, snapshot, delay),
+        name="object-info-refresh",
+        daemon=True,
+    ).start()
+    return index
@@ -0,0 +1,119 @@
+import atexit
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+# Images the writer thread takes off the queue and writes in one go.
+ARCHIVE_BATCH_SIZE = 16
+
+# Seconds to wait at exit for queued images to be written.
+ARCHIVE_EXIT_TIMEOUT = 10
+
+# PNG text chunk holding what SimplUI knows about the image.
+METADATA_KEY = "simplui"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Signature, then the IHDR chunk: length, type, 13 bytes of data and CRC.
+_IHDR_END = len(PNG_SIGNATURE) + 4 + 4 + 13 + 4
+
+
+def _png_chunk(chunk_type, data):
+    crc = zlib.crc32(chunk_type + data)
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+
+def png_with_text(png, key, text):
+    """Returns png with an uncompressed iTXt chunk added, without decoding it."""
+    if png[: len(PNG_SIGNATURE)] != PNG_SIGNATURE or png[12:16] != b"IHDR":
+        raise ValueError("Not a PNG image")
+    # keyword, compression flag and method, empty language tag and translated keyword
+    data = key.encode("latin-1") + b"\0\0\0\0\0" + text.encode("utf-8")
+    return png[:_IHDR_END] + _png_chunk(b"iTXt", data) + png[_IHDR_END:]
+
+
+class OutputArchive:
+    """Keeps a copy of every final image in a directory, with how it was made.
+
+    save() only queues the image; one background thread writes queued images in
+    batches, so generation never waits on the disk. PNGs get the metadata as a
+    text chunk added to the file ComfyUI produced, other formats a .json file
+    next to the copy.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {"pending": self.pending, "written": self.written, "failed": self.failed}
+
+    def save(self, source_path, metadata):
+        """Queues source_path for archiving and returns where the copy will be."""
+        path = self.archive_path(source_path, time.time())
+        self._queue.put((source_path, path, metadata))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="output-archive", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+        return path
+
+    def close(self, timeout=ARCHIVE_EXIT_TIMEOUT):
+        """Writes what is still queued, waiting at most timeout seconds."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < ARCHIVE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                if item is None:
+                    return
+                try:
+                    self._write(*item)
+                    self.written += 1
+                except (OSError, ValueError) as e:
+                    self.failed += 1
+                    print(f"Warning: Could not archive {item[0]}: {e}")
+
+    def archive_path(self, source_path, created):
+        day = time.strftime("%Y-%m-%d", time.localtime(created))
+        stamp = time.strftime("%H%M%S", time.localtime(created))
+        name, extension = os.path.splitext(os.path.basename(source_path))
+        return os.path.join(self.directory, day, f"{stamp}-{name[:12]}{extension}")
+
+    def _write(self, source_path, path, metadata):
+        with open(source_path, "rb") as f:
+            data = f.read()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        text = json.dumps(metadata)
+        if data.startswith(PNG_SIGNATURE):
+            data = png_with_text(data, METADATA_KEY, text)
+        else:
+            with open(f"{os.path.splitext(path)[0]}.json", "w") as f:
+                f.write(text)
+        with open(path, "wb") as f:
+            f.write(data)
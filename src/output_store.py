@@ -0,0 +1,117 @@
+import collections
+import contextlib
+import hashlib
+import os
+import threading
+
+try:
+    from .preview_store import image_extension
+except ImportError:
+    from preview_store import image_extension
+
+
+class OutputStore:
+    """Final images as content-addressed files, each written once.
+
+    The gallery, history and their states hold the returned paths instead of
+    decoded images, so yielding them again encodes nothing. The same image always
+    maps to the same path. Once the files add up to more than max_bytes, the least
+    recently written ones are deleted and on_evict is called with each path; the
+    archive, if any, keeps the lasting copy. Files a session still shows are kept
+    past the budget for as long as it retains them.
+    """
+
+    def __init__(self, directory, max_bytes=None, on_evict=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.used_bytes = 0
+        # path -> size, least recently written first; None until the directory is read
+        self._files = None
+        # owner -> paths it retains, and path -> number of owners retaining it
+        self._retained = {}
+        self._refs = collections.Counter()
+        # Written from worker threads
+        self._lock = threading.Lock()
+
+    def path_for(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + image_extension(data))
+
+    def _scan(self):
+        # Files left by earlier runs count against the budget too, oldest first
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                with contextlib.suppress(OSError):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime_ns, path, stat.st_size))
+        files.sort()
+        self._files = collections.OrderedDict((path, size) for _, path, size in files)
+        self.used_bytes = sum(self._files.values())
+
+    def write(self, data):
+        """Stores data and returns its path; coroutines call it through to_thread."""
+        path = self.path_for(data)
+        with self._lock:
+            if self._files is None:
+                self._scan()
+            if path in self._files and os.path.exists(path):
+                self._files.move_to_end(path)
+                return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write aside and rename, so a crash never leaves a truncated image behind
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._add(path, len(data))
+        return path
+
+    def adopt(self, source_path):
+        """Copies a file written elsewhere into the store and returns its path there."""
+        with open(source_path, "rb") as f:
+            return self.write(f.read())
+
+    def retain(self, owner, paths):
+        """Keeps paths from eviction for owner, in place of what it retained before.
+
+        Sessions retain what their galleries and states still point at, and
+        retain nothing once they are gone.
+        """
+        paths = set(paths)
+        with self._lock:
+            previous = self._retained.pop(owner, set())
+            for path in previous - paths:
+                self._refs[path] -= 1
+                if not self._refs[path]:
+                    del self._refs[path]
+            self._refs.update(paths - previous)
+            if paths:
+                self._retained[owner] = paths
+
+    def _add(self, path, size):
+        evicted = []
+        with self._lock:
+            if path not in self._files:
+                self._files[path] = size
+                self.used_bytes += size
+            self._files.move_to_end(path)
+            if self.max_bytes is not None and self.used_bytes > self.max_bytes:
+                # The file just written and retained ones always stay
+                for old_path in list(self._files):
+                    if self.used_bytes <= self.max_bytes:
+                        break
+                    if old_path == path or old_path in self._refs:
+                        continue
+                    self.used_bytes -= self._files.pop(old_path)
+                    evicted.append(old_path)
+        for old_path in evicted:
+            with contextlib.suppress(OSError):
+                os.remove(old_path)
+            if self.on_evict is not None:
+                self.on_evict(old_path)
@@ -0,0 +1,75 @@
+import collections
+
+# Compiled plans kept around, most recently used last
+PLAN_CACHE_SIZE = 64
+
+
+def is_input_override(key):
+    # Only keys that address a node input; '.Dimensions.' and '.randomize' are UI-only
+    return "." in key and ".Dimensions." not in key and not key.endswith(".randomize")
+
+
+class OverridePlan:
+    """Override keys of one workflow resolved to the node inputs they replace.
+
+    apply() builds a payload that shares every untouched node with the source
+    workflow and copies only the nodes it writes to. The registry hands out frozen
+    workflows, so writing to a shared node of the payload raises instead of changing
+    the workflow for every session.
+    """
+
+    def __init__(self, workflow, keys):
+        self.workflow = workflow
+        # key -> (node_id, input_name)
+        self.slots = {}
+        for key in keys:
+            if not is_input_override(key):
+                continue
+            parts = key.split(".")
+            if len(parts) != 2:
+                continue
+            node_id, input_name = parts
+            if node_id in workflow and "inputs" in workflow[node_id]:
+                self.slots[key] = (node_id, input_name)
+
+    def apply(self, overrides, writable_nodes=()):
+        """Returns a payload with overrides applied.
+
+        writable_nodes are copied as well, for callers that edit them afterwards.
+        """
+        payload = dict(self.workflow)
+        touched = {node_id for node_id, _ in self.slots.values()}
+        for node_id in touched.union(writable_nodes):
+            node = payload.get(node_id)
+            if not isinstance(node, dict):
+                continue
+            node = dict(node)
+            if "inputs" in node:
+                node["inputs"] = dict(node["inputs"])
+            payload[node_id] = node
+
+        for key, (node_id, input_name) in self.slots.items():
+            value = overrides[key]
+            if isinstance(value, str) and value.isdigit():
+                value = int(value)
+            payload[node_id]["inputs"][input_name] = value
+        return payload
+
+
+_plans = collections.OrderedDict()
+
+
+def compile_override_plan(workflow, keys):
+    """Returns the cached plan for this workflow object and override key set."""
+    cache_key = (id(workflow), frozenset(keys))
+    plan = _plans.get(cache_key)
+    # The plan holds on to its workflow, so the id cannot be reused while cached
+    if plan is not None and plan.workflow is workflow:
+        _plans.move_to_end(cache_key)
+        return plan
+
+    plan = OverridePlan(workflow, cache_key[1])
+    _plans[cache_key] = plan
+    if len(_plans) > PLAN_CACHE_SIZE:
+        _plans.popitem(last=False)
+    return plan
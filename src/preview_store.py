@@ -0,0 +1,72 @@
+import collections
+import contextlib
+import hashlib
+import os
+import threading
+import time
+
+try:
+    from .config_manager import DEFAULT_PREVIEW_MAX_AGE
+except ImportError:
+    from config_manager import DEFAULT_PREVIEW_MAX_AGE
+
+_SIGNATURES = (
+    (b"\x89PNG", ".png"),
+    (b"\xff\xd8", ".jpg"),
+    (b"RIFF", ".webp"),
+    (b"GIF8", ".gif"),
+)
+
+
+def image_extension(data):
+    header = bytes(data[:4])
+    for signature, extension in _SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    # ComfyUI sends JPEG previews unless told otherwise
+    return ".jpg"
+
+
+class PreviewStore:
+    """Writes encoded preview frames to files the gallery serves as they are.
+
+    Nothing is decoded or re-encoded on the way to the browser. Files are named
+    by content, so every new frame gets a new URL. A file is deleted once it has
+    not been written for max_age seconds, however many sessions stream meanwhile,
+    so a slow browser still finds the frame it was sent.
+    """
+
+    def __init__(self, directory, max_age=DEFAULT_PREVIEW_MAX_AGE):
+        self.directory = directory
+        self.max_age = max_age
+        # path -> time.monotonic() of its last write, oldest first
+        self._files = collections.OrderedDict()
+        # Written from worker threads
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        """Stores a frame and returns its path; coroutines call it through to_thread."""
+        name = hashlib.sha1(data).hexdigest()[:20] + image_extension(data)
+        path = os.path.join(self.directory, name)
+        now = time.monotonic()
+        with self._lock:
+            known = path in self._files
+            if known:
+                self._files.move_to_end(path)
+            self._files[path] = now
+            expired = []
+            while self._files:
+                old_path, written = next(iter(self._files.items()))
+                if now - written <= self.max_age:
+                    break
+                del self._files[old_path]
+                expired.append(old_path)
+
+        if not known:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+        for old_path in expired:
+            with contextlib.suppress(OSError):
+                os.remove(old_path)
+        return path
@@ -0,0 +1,111 @@
+import asyncio
+import collections
+import contextlib
+import os
+
+# Longest edge, in pixels, of the images shown in the history grid.
+THUMBNAIL_SIZE = 384
+
+# Longest edge of the images shown in the main gallery.
+DISPLAY_SIZE = 1536
+
+RENDITION_SIZES = {"thumbnail": THUMBNAIL_SIZE, "display": DISPLAY_SIZE}
+
+# Renditions whose paths are remembered; older ones are looked up on disk again.
+SHOWN_CACHE_SIZE = 4096
+
+
+class RenditionStore:
+    """Downscaled WebP copies of final images for the galleries to show.
+
+    Each image is rendered once, off the event loop, into files named after the
+    source, which is content-addressed, so a rendition's URL never changes
+    meaning. Images already small enough are shown as they are, and until a
+    rendition exists the original is shown instead.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        # (source path, kind) -> path to show, least recently used first
+        self._shown = collections.OrderedDict()
+        # source path -> task rendering it
+        self._rendering = {}
+
+    def _remember(self, key, path):
+        self._shown[key] = path
+        self._shown.move_to_end(key)
+        while len(self._shown) > SHOWN_CACHE_SIZE:
+            self._shown.popitem(last=False)
+
+    def path_for(self, source, kind):
+        name = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.directory, f"{name}-{RENDITION_SIZES[kind]}.webp")
+
+    def _render(self, source, kinds):
+        # PIL comes in with gradio anyway, but is only needed once images arrive
+        from PIL import Image
+
+        with Image.open(source) as image:
+            image.load()
+            shown = {}
+            for kind in kinds:
+                size = RENDITION_SIZES[kind]
+                if max(image.size) <= size:
+                    shown[kind] = source
+                    continue
+                path = self.path_for(source, kind)
+                if not os.path.exists(path):
+                    os.makedirs(self.directory, exist_ok=True)
+                    rendition = image.copy()
+                    rendition.thumbnail((size, size))
+                    temp_path = f"{path}.tmp"
+                    rendition.save(temp_path, format="WEBP", quality=85)
+                    os.replace(temp_path, path)
+                shown[kind] = path
+            return shown
+
+    async def render(self, source, kinds=tuple(RENDITION_SIZES)):
+        """Makes the renditions of source unless that was done before."""
+        kinds = [kind for kind in kinds if (source, kind) not in self._shown]
+        if not kinds:
+            return
+        try:
+            shown = await asyncio.to_thread(self._render, source, kinds)
+        except OSError as e:
+            print(f"Warning: Could not render {source}: {e}")
+            return
+        for kind, path in shown.items():
+            self._remember((source, kind), path)
+
+    def render_in_background(self, source):
+        """Starts render(source) without waiting for it; the original is shown meanwhile."""
+        if source in self._rendering or (source, "display") in self._shown:
+            return
+        task = asyncio.ensure_future(self.render(source))
+        self._rendering[source] = task
+        task.add_done_callback(lambda _: self._rendering.pop(source, None))
+
+    def shown(self, source, kind):
+        """The file to show for source, the original until a rendition exists."""
+        path = self._shown.get((source, kind))
+        if path is not None:
+            self._shown.move_to_end((source, kind))
+            return path
+        if not isinstance(source, str):
+            return source
+        # Rendered by an earlier run of SimplUI, or forgotten since
+        rendition = self.path_for(source, kind)
+        if os.path.exists(rendition):
+            self._remember((source, kind), rendition)
+            return rendition
+        return source
+
+    def remove(self, source):
+        """Deletes the renditions of source, e.g. once source itself is deleted."""
+        for kind in RENDITION_SIZES:
+            self._shown.pop((source, kind), None)
+            with contextlib.suppress(OSError):
+                os.remove(self.path_for(source, kind))
+
+    def shown_list(self, sources, kind):
+        return [self.shown(source, kind) for source in sources]
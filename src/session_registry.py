@@ -0,0 +1,81 @@
+import asyncio
+
+# Keeps fire-and-forget cleanup tasks alive until they finish
+_background_tasks = set()
+
+
+def cancel_prompts_in_background(comfy_client, prompt_ids, submissions=()):
+    """Cancels prompts on ComfyUI without awaiting, so it is safe during task cancellation.
+
+    ComfyUI may accept a submission still in flight, so it is cancelled once it returns.
+    """
+    prompt_ids = list(prompt_ids)
+    for task in submissions:
+        if not task.done():
+            task.add_done_callback(
+                lambda task: cancel_prompts_in_background(comfy_client, [], [task])
+            )
+        elif not task.cancelled() and task.exception() is None:
+            if task.result() not in prompt_ids:
+                prompt_ids.append(task.result())
+    if prompt_ids:
+        cleanup = asyncio.ensure_future(comfy_client.cancel_prompts(prompt_ids))
+        _background_tasks.add(cleanup)
+        cleanup.add_done_callback(_background_tasks.discard)
+
+
+class GenerationRun:
+    """Prompts owned by one click of Generate."""
+
+    def __init__(self):
+        # prompt_ids of the batch item currently being streamed
+        self.prompt_ids = []
+        # Batch index -> task resolving to a prompt_id queued ahead on ComfyUI
+        self.submissions = {}
+
+    def release(self, comfy_client):
+        cancel_prompts_in_background(comfy_client, self.prompt_ids, self.submissions.values())
+        self.prompt_ids.clear()
+        self.submissions.clear()
+
+
+class GenerationContext:
+    """Generation state of one browser session."""
+
+    def __init__(self):
+        self.skip_event = asyncio.Event()
+        self.runs = set()
+
+    def start_run(self):
+        run = GenerationRun()
+        self.runs.add(run)
+        return run
+
+    def finish_run(self, run):
+        self.runs.discard(run)
+
+    def release(self, comfy_client):
+        """Cancels everything this session still has on ComfyUI."""
+        for run in list(self.runs):
+            run.release(comfy_client)
+        self.runs.clear()
+
+
+class SessionRegistry:
+    """Maps Gradio session hashes to their GenerationContext."""
+
+    def __init__(self):
+        self._contexts = {}
+
+    def __len__(self):
+        return len(self._contexts)
+
+    def get(self, session_id):
+        context = self._contexts.get(session_id)
+        if context is None:
+            context = GenerationContext()
+            self._contexts[session_id] = context
+        return context
+
+    def remove(self, session_id):
+        return self._contexts.pop(session_id, None)
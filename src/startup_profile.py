@@ -0,0 +1,56 @@
+import builtins
+import contextlib
+import sys
+import time
+
+# Rows shown for the slowest imports.
+SLOWEST_IMPORTS = 10
+
+
+class StartupProfile:
+    """Times startup phases and first imports for --startup-profile.
+
+    Import times include the modules each import pulls in. Disabled profiles
+    do nothing, so the call sites can stay in place.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = []
+        self.imports = {}
+        self._started = time.perf_counter()
+        self._original_import = None
+        if enabled:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.imports.setdefault(name, time.perf_counter() - start)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.phases.append((name, time.perf_counter() - start))
+
+    def report(self):
+        if not self.enabled:
+            return
+        builtins.__import__ = self._original_import
+        total = time.perf_counter() - self._started
+        print(f"Startup profile: {total * 1000:.0f} ms until launch")
+        for name, elapsed in self.phases:
+            print(f"  {name:<36} {elapsed * 1000:8.0f} ms")
+        print("Slowest imports:")
+        slowest = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)
+        for name, elapsed in slowest[:SLOWEST_IMPORTS]:
+            print(f"  {name:<36} {elapsed * 1000:8.0f} ms")
@@ -1,13 +1,46 @@
 import gradio as gr
 import json
 import asyncio
-from PIL import Image
-import io
+import os
 import copy
+import collections
 import random
+import time
+import types
+import contextlib
+import secrets
+import uuid
 
 try:
     from .seed_utils import generate_batch_seeds
+    from .session_registry import (
+        GenerationRun,
+        SessionRegistry,
+        cancel_prompts_in_background,
+    )
+    from .job_scheduler import BULK, INTERACTIVE, JobScheduler
+    from .workflow_registry import load_workflow
+    from .override_plan import compile_override_plan
+    from .event_channel import coalesce_events
+    from .config_manager import (
+        DEFAULT_HISTORY_LIMIT,
+        DEFAULT_IMAGE_MEMORY_MB,
+        DEFAULT_MAX_PROGRESS_HZ,
+        DEFAULT_OUTPUT_CACHE_MB,
+        DEFAULT_PREVIEW_MAX_AGE,
+    )
+    from .preview_store import PreviewStore
+    from .output_store import OutputStore
+    from .image_memory import ImageMemory
+    from .renditions import RenditionStore
+    from .output_archive import OutputArchive
+    from .history_db import HistoryDB
+    from .object_info_index import (
+        ObjectInfoIndex,
+        ObjectInfoSnapshot,
+        load_object_info_index,
+        workflow_class_types,
+    )
     from .dimension_utils import (
         find_matching_preset,
         find_nearest_preset,
@@ -15,14 +48,58 @@ try:
     )
 except ImportError:
     from seed_utils import generate_batch_seeds
+    from session_registry import (
+        GenerationRun,
+        SessionRegistry,
+        cancel_prompts_in_background,
+    )
+    from job_scheduler import BULK, INTERACTIVE, JobScheduler
+    from workflow_registry import load_workflow
+    from override_plan import compile_override_plan
+    from event_channel import coalesce_events
+    from config_manager import (
+        DEFAULT_HISTORY_LIMIT,
+        DEFAULT_IMAGE_MEMORY_MB,
+        DEFAULT_MAX_PROGRESS_HZ,
+        DEFAULT_OUTPUT_CACHE_MB,
+        DEFAULT_PREVIEW_MAX_AGE,
+    )
+    from preview_store import PreviewStore
+    from output_store import OutputStore
+    from image_memory import ImageMemory
+    from renditions import RenditionStore
+    from output_archive import OutputArchive
+    from history_db import HistoryDB
+    from object_info_index import (
+        ObjectInfoIndex,
+        ObjectInfoSnapshot,
+        load_object_info_index,
+        workflow_class_types,
+    )
     from dimension_utils import (
         find_matching_preset,
         find_nearest_preset,
         calculate_dimensions,
     )
 
+# Images live in Gradio's own cache folder, which it serves without copying. Final
+# images past the budget go, with their renditions; create_ui sets the budget.
+preview_store = PreviewStore(os.path.join(gr.utils.get_upload_folder(), "simplui-previews"))
+renditions = RenditionStore(os.path.join(gr.utils.get_upload_folder(), "simplui-renditions"))
+output_store = OutputStore(
+    os.path.join(gr.utils.get_upload_folder(), "simplui-outputs"),
+    DEFAULT_OUTPUT_CACHE_MB * 1024 * 1024,
+    on_evict=renditions.remove,
+)
+
+# Caps image bytes buffered by every session's streams together; create_ui sets the budget
+image_memory = ImageMemory(DEFAULT_IMAGE_MEMORY_MB * 1024 * 1024, spill=output_store.write)
+
 
 def extract_workflow_inputs(workflow, object_info=None, slider_config=None):
+    # Accept the raw /object_info response as well as its index
+    if object_info and not isinstance(object_info, ObjectInfoIndex):
+        object_info = ObjectInfoIndex.from_object_info(object_info)
     extracted = []
     for node_id, node_data in workflow.items():
         title = node_data.get("_meta", {}).get("title", f"Node {node_id}")
@@ -34,11 +111,6 @@ def extract_workflow_inputs(workflow, object_info=None, slider_config=None):
         has_width = "width" in node_inputs
         has_height = "height" in node_inputs
 
-        # Get node definition from object_info
-        node_def = None
-        if object_info and class_type in object_info:
-            node_def = object_info[class_type]
-
         if has_width and has_height:
             # Special 'dimensions' type
             inputs.append(
@@ -69,28 +141,15 @@ def extract_workflow_inputs(workflow, object_info=None, slider_config=None):
             slider_params = {}
 
             # Check for Enum/Number in object_info
-            if node_def:
-                # Inputs can be in 'required' or 'optional'
-                input_def = node_def.get("input", {}).get("required", {}).get(name)
-                if not input_def:
-                    input_def = node_def.get("input", {}).get("optional", {}).get(name)
-
-                # If input definition is a list
-                if isinstance(input_def, list) and len(input_def) > 0:
-                    # Enum
-                    if isinstance(input_def[0], list):
-                        input_type = "enum"
-                        options = input_def[0]
-                    # Number definition from object_info
-                    elif len(input_def) > 1 and isinstance(input_def[1], dict):
-                        # Format: ["INT", {"default": 20, "min": 1, "max": 10000}]
-                        meta_params = input_def[1]
-                        if "min" in meta_params and "max" in meta_params:
-                            slider_params["min"] = meta_params["min"]
-                            slider_params["max"] = meta_params["max"]
-                            slider_params.setdefault(
-                                "step", meta_params.get("step")
-                            )  # step might be missing
+            spec = object_info.get(class_type, name) if object_info else None
+            if spec is not None:
+                if spec.kind == "enum":
+                    input_type = "enum"
+                    options = list(spec.options)
+                elif spec.kind == "number":
+                    slider_params["min"] = spec.min
+                    slider_params["max"] = spec.max
+                    slider_params["step"] = spec.step  # step might be missing
 
             if input_type != "enum":
                 if isinstance(value, bool):
@@ -125,26 +184,53 @@ def extract_workflow_inputs(workflow, object_info=None, slider_config=None):
     return extracted
 
 
-def merge_workflow_overrides(workflow, overrides):
-    merged = copy.deepcopy(workflow)
-    if not overrides:
-        return merged
-    for key, value in overrides.items():
-        # Only process keys that are intended for node inputs
-        # Filter out UI-only metadata like '.Dimensions.' or '.randomize'
-        if "." in key and ".Dimensions." not in key and not key.endswith(".randomize"):
-            parts = key.split(".")
-            if len(parts) == 2:
-                node_id, input_name = parts
-                if node_id in merged and "inputs" in merged[node_id]:
-                    if isinstance(value, str) and value.isdigit():
-                        value = int(value)
-                    merged[node_id]["inputs"][input_name] = value
-    return merged
+def _freeze(value):
+    if isinstance(value, dict):
+        return types.MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+# Extraction results kept around, most recently used last
+EXTRACTION_CACHE_SIZE = 32
+_extraction_cache = collections.OrderedDict()
+
+
+def cached_workflow_inputs(workflow, object_info=None, slider_config=None):
+    """Memoized extract_workflow_inputs, returned read-only so sessions can share it.
+
+    Keyed by workflow and object_info identity, which is stable for the shared
+    workflows from the registry, the object_info version and the slider configuration.
+    """
+    key = (
+        id(workflow),
+        id(object_info),
+        # A background refresh updates the index in place
+        getattr(object_info, "version", None),
+        json.dumps(slider_config, sort_keys=True),
+    )
+    entry = _extraction_cache.get(key)
+    # Entries hold on to their inputs, so the ids cannot be reused while cached
+    if entry is not None and entry[0] is workflow and entry[1] is object_info:
+        _extraction_cache.move_to_end(key)
+        return entry[2]
+
+    extracted = _freeze(extract_workflow_inputs(workflow, object_info, slider_config))
+    _extraction_cache[key] = (workflow, object_info, extracted)
+    if len(_extraction_cache) > EXTRACTION_CACHE_SIZE:
+        _extraction_cache.popitem(last=False)
+    return extracted
+
+
+def merge_workflow_overrides(workflow, overrides, writable_nodes=()):
+    # Untouched nodes are shared with workflow, only overridden ones are copied
+    plan = compile_override_plan(workflow, overrides.keys() if overrides else ())
+    return plan.apply(overrides or {}, writable_nodes)
 
 
 def apply_random_seeds(overrides):
-    updated = copy.deepcopy(overrides)
+    updated = dict(overrides)
     for key, value in overrides.items():
         if key.endswith(".randomize") and value is True:
             base_key = key[:-10]  # remove .randomize
@@ -167,65 +253,217 @@ def get_prompt_default_value(workflow):
     return ""
 
 
-async def handle_generation(workflow_name, prompt_text, config, comfy_client, overrides=None):
+def prepare_workflow(workflow_json, prompt_text, comfy_client, overrides=None):
+    # Apply Overrides without touching the loaded workflow, which is shared; the
+    # Prompt node is copied too since inject_prompt edits it in place
+    writable_nodes = ()
+    if prompt_text:
+        writable_nodes = (comfy_client.find_node_by_title(workflow_json, "Prompt"),)
+    workflow_json = merge_workflow_overrides(workflow_json, overrides, writable_nodes)
+
+    # Inject Prompt if provided
+    if prompt_text:
+        comfy_client.inject_prompt(workflow_json, prompt_text)
+    return workflow_json
+
+
+async def handle_generation(
+    workflow_name,
+    prompt_text,
+    config,
+    comfy_client,
+    overrides=None,
+    prompt_ids=None,
+    max_progress_hz=DEFAULT_MAX_PROGRESS_HZ,
+):
     # 1. Find workflow path
     workflow_info = next(w for w in config.workflows if w["name"] == workflow_name)
 
     # 2. Load workflow JSON
     try:
-        with open(workflow_info["path"], "r") as f:
-            workflow_json = json.load(f)
+        workflow_json = load_workflow(workflow_info["path"])
     except Exception as e:
         yield [], None, f"Error loading workflow: {e}"
         return
 
-    # 2.5 Apply Overrides
-    if overrides:
-        workflow_json = merge_workflow_overrides(workflow_json, overrides)
-
-    # 3. Inject Prompt if provided
-    if prompt_text:
-        comfy_client.inject_prompt(workflow_json, prompt_text)
+    # 3. Apply overrides and inject the prompt
+    workflow_json = prepare_workflow(workflow_json, prompt_text, comfy_client, overrides)
 
     # 4. Generate Image (Connect -> Submit -> Listen)
+    events = comfy_client.generate_image(workflow_json)
+    async for update in stream_generation(events, prompt_ids, max_progress_hz):
+        yield update
+
+
+async def stream_generation(events, prompt_ids=None, max_progress_hz=DEFAULT_MAX_PROGRESS_HZ):
     try:
         completed_images = []
         latest_preview = None
         last_status = "Starting..."
-        async for event in comfy_client.generate_image(workflow_json):
-            if event["type"] == "progress":
+        # Previews the UI has not caught up with are dropped before being decoded
+        async for event in coalesce_events(events, max_progress_hz, image_memory):
+            if event["type"] == "queued":
+                # Record ownership so cancellation only touches this run's prompts
+                if prompt_ids is not None:
+                    prompt_ids.append(event["prompt_id"])
+            elif event["type"] == "waiting":
+                last_status = f"Waiting for a free GPU (queue position {event['position']})"
+                yield list(completed_images), latest_preview, last_status
+            elif event["type"] == "progress":
                 last_status = f"Progress: {event['value']}/{event['max']}"
                 # Yield completed images, latest preview, and status
                 yield list(completed_images), latest_preview, last_status
             elif event["type"] == "preview":
                 try:
-                    preview_image = Image.open(io.BytesIO(event["data"]))
-                    latest_preview = preview_image
+                    # The gallery gets the JPEG/PNG file ComfyUI sent, nothing is decoded
+                    latest_preview = await asyncio.to_thread(preview_store.write, event["data"])
                     yield list(completed_images), latest_preview, last_status
-                except Exception as e:
+                except OSError:
                     pass
             elif event["type"] == "image":
-                image_bytes = event["data"]
                 try:
-                    final_image = Image.open(io.BytesIO(image_bytes))
+                    # Saved once and shown by path, so re-yielding the list encodes nothing.
+                    # Images spilled while buffered are already on disk.
+                    final_image = event.get("path") or await asyncio.to_thread(
+                        output_store.write, event["data"]
+                    )
+                    # The original is shown until its renditions are ready
+                    renditions.render_in_background(final_image)
                     completed_images.append(final_image)
                     latest_preview = None  # Clear preview as it is replaced by final image
                     yield list(completed_images), latest_preview, "Image received"
-                except Exception as e:
-                    yield list(completed_images), latest_preview, f"Error processing image: {e}"
-        
+                except OSError as e:
+                    yield list(completed_images), latest_preview, f"Error saving image: {e}"
+
         # PROMOTION: If we finished but have no final images, use the last preview
         if not completed_images and latest_preview:
+            # Kept with the final images, the preview store soon deletes its copy
+            try:
+                latest_preview = await asyncio.to_thread(output_store.adopt, latest_preview)
+            except OSError as e:
+                print(f"Warning: Could not keep preview {latest_preview}: {e}")
             completed_images.append(latest_preview)
             latest_preview = None
             yield list(completed_images), latest_preview, "Using final preview as result"
-            
+
         yield list(completed_images), None, "Batch finished"
-            
+
     except Exception as e:
         yield [], None, f"Error during generation: {e}"
 
 
+async def _submit_in_order(comfy_client, workflow_json, previous=None):
+    # Keep ComfyUI's queue in batch order even though submissions run ahead
+    if previous is not None:
+        await asyncio.wait([previous])
+    return await comfy_client.queue_prompt(workflow_json)
+
+
+async def _stream_submitted(comfy_client, submission):
+    prompt_id = await submission
+    yield {"type": "queued", "prompt_id": prompt_id}
+    async with contextlib.aclosing(comfy_client.stream_prompt(prompt_id)) as events:
+        async for event in events:
+            yield event
+
+
+async def _collect_item(index, events, updates, max_progress_hz):
+    # Waiting on a full queue makes the item's stream drop previews nobody will see
+    async for update in stream_generation(events, max_progress_hz=max_progress_hz):
+        await updates.put((index, update))
+    await updates.put((index, None))
+
+
+async def _generate_by_completion(
+    comfy_client,
+    batch_count,
+    pipeline_depth,
+    submit,
+    submissions,
+    skip_event,
+    previous_images,
+    finish_item,
+    max_progress_hz=DEFAULT_MAX_PROGRESS_HZ,
+):
+    # Runs up to pipeline_depth items at once and lists each one as soon as it finishes
+    updates = asyncio.Queue(maxsize=pipeline_depth)
+    running = {}
+    item_updates = {}
+    shown_index = None
+    next_index = 0
+    finished = 0
+    get_task = None
+
+    try:
+        while next_index < batch_count or running:
+            while next_index < batch_count and len(running) < pipeline_depth:
+                submit(next_index)
+                events = _stream_submitted(comfy_client, asyncio.shield(submissions[next_index]))
+                running[next_index] = asyncio.create_task(
+                    _collect_item(next_index, events, updates, max_progress_hz)
+                )
+                next_index += 1
+
+            if get_task is None:
+                get_task = asyncio.create_task(updates.get())
+            tasks = [get_task]
+            if skip_event:
+                skip_task = asyncio.create_task(skip_event.wait())
+                tasks.append(skip_task)
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+
+            if skip_event and skip_event.is_set():
+                # An update taken in the same wakeup is handled on the next pass, so an
+                # item's end marker is never lost
+                skip_event.clear()
+                # Skip the item whose preview is on screen, else the oldest one
+                target = shown_index if shown_index in running else min(running)
+                running.pop(target).cancel()
+                cancel_prompts_in_background(comfy_client, [], [submissions.pop(target)])
+                previous_images.extend(item_updates.pop(target, ([],))[0])
+                finished += 1
+                shown_index = None
+                yield list(previous_images), "Skipping...", list(previous_images)
+                continue
+            if skip_event:
+                skip_task.cancel()
+
+            index, update = get_task.result()
+            get_task = None
+            if index not in running:
+                continue  # Late update from a skipped item
+            if update is None:
+                running.pop(index)
+                submission = submissions.pop(index, None)
+                prompt_id = None
+                if submission is not None and submission.done() and not submission.cancelled():
+                    if submission.exception() is None:
+                        prompt_id = submission.result()
+                completed = item_updates.pop(index, ([],))[0]
+                previous_images.extend(completed)
+                await finish_item(index, completed, prompt_id)
+                finished += 1
+                status = "Image received"
+            else:
+                item_updates[index] = update
+                if update[1] is not None:
+                    shown_index = index
+                status = update[2]
+
+            safe_images = previous_images + [
+                image for j in sorted(item_updates) for image in item_updates[j][0]
+            ]
+            display_images = list(safe_images)
+            if shown_index in item_updates and item_updates[shown_index][1] is not None:
+                display_images.append(item_updates[shown_index][1])
+            yield display_images, f"{status} ({finished}/{batch_count} done)", safe_images
+    finally:
+        if get_task is not None:
+            get_task.cancel()
+        for task in running.values():
+            task.cancel()
+
+
 async def process_generation(
     workflow_name,
     prompt_text,
@@ -236,31 +474,46 @@ async def process_generation(
     object_info,
     history_state,
     skip_event=None,
+    pipeline_depth=1,
+    batch_order="batch",
+    context=None,
+    max_progress_hz=DEFAULT_MAX_PROGRESS_HZ,
+    history_limit=DEFAULT_HISTORY_LIMIT,
+    archive=None,
+    history_db=None,
+    owner=None,
 ):
+    # History holds paths to images on disk; the gallery is only re-sent when it changes
+    history_shown = list(history_state)
+
+    def history_update():
+        nonlocal history_shown
+        if history_limit:
+            del history_state[:-history_limit]
+        if history_state == history_shown:
+            return gr.update()
+        history_shown = list(history_state)
+        return history_shown[:]
+
     # Initial status: Hide Generate, Show Stop, Show Skip
     yield None, "Initializing...", gr.update(visible=False), gr.update(visible=True), gr.update(
         visible=True
-    ), gr.update(), history_state[:], []
-
-    # Auto-stop previous runs
-    try:
-        comfy_client.interrupt()
-        comfy_client.clear_queue()
-        # Small delay to ensure server processes interrupt before new submission
-        await asyncio.sleep(0.1)
-    except Exception:
-        pass
+    ), gr.update(), history_update(), []
 
     # Load Workflow JSON
     workflow_info = next(w for w in config.workflows if w["name"] == workflow_name)
-    with open(workflow_info["path"], "r") as f:
-        workflow_json = json.load(f)
+    workflow_json = load_workflow(workflow_info["path"])
 
     # Augment overrides with default random seeds
     if overrides is None:
         overrides = {}
 
-    extracted = extract_workflow_inputs(workflow_json, object_info, config.sliders)
+    if isinstance(object_info, ObjectInfoIndex):
+        class_types = workflow_class_types([workflow_json])
+        if object_info.missing(class_types):
+            # Node classes added since startup; fetching them blocks on ComfyUI
+            await asyncio.to_thread(object_info.fetch, class_types)
+    extracted = cached_workflow_inputs(workflow_json, object_info, config.sliders)
     for node in extracted:
         for inp in node["inputs"]:
             if inp["type"] == "seed":
@@ -287,12 +540,12 @@ async def process_generation(
             # Update store with new seeds - Keep button state
             yield None, "Randomizing seeds...", gr.update(visible=False), gr.update(
                 visible=True
-            ), gr.update(visible=True), overrides, history_state[:], []
+            ), gr.update(visible=True), overrides, history_update(), []
         else:
             # Still need to hide generate/show stop
             yield None, "Starting generation...", gr.update(visible=False), gr.update(
                 visible=True
-            ), gr.update(visible=True), gr.update(), history_state[:], []
+            ), gr.update(visible=True), gr.update(), history_update(), []
 
     # Calculate Batch Seeds
     seed_batches = {}
@@ -306,127 +559,241 @@ async def process_generation(
                     base = int(inp["value"])
                 seed_batches[key] = generate_batch_seeds(base, batch_count)
 
+    def batch_overrides(index):
+        # Layer this item's seeds over the shared overrides instead of copying them
+        # Store as string for overrides compatibility
+        seeds = {key: str(batch[index]) for key, batch in seed_batches.items()}
+        return collections.ChainMap(seeds, overrides or {})
+
+    # Batch index -> time.monotonic() when the item started
+    item_started = {}
+
+    async def finish_item(index, images, prompt_id=None):
+        history_state.extend(images)
+        if context is not None:
+            # The output store must not delete what this session's history points at
+            output_store.retain(
+                context, history_state[-history_limit:] if history_limit else history_state
+            )
+        if not images or (archive is None and history_db is None):
+            return
+        item_overrides = batch_overrides(index)
+        seeds = {key: int(item_overrides[key]) for key in seed_batches}
+        other_overrides = {k: v for k, v in (overrides or {}).items() if k not in seed_batches}
+        paths = list(images)
+        if archive is not None:
+            metadata = {
+                "workflow_name": workflow_name,
+                "prompt": prompt_text,
+                "seeds": seeds,
+                "overrides": other_overrides,
+                "workflow": prepare_workflow(
+                    workflow_json, prompt_text, comfy_client, item_overrides
+                ),
+            }
+            # Only queued here; the archive writes on its own thread
+            paths = [archive.save(image, metadata) for image in images]
+        if history_db is not None:
+            started = item_started.get(index)
+            try:
+                # SQLite blocks, and shares its lock with the History tab's reads
+                await asyncio.to_thread(
+                    history_db.add,
+                    list(zip(paths, images)),
+                    time.time(),
+                    owner=owner,
+                    workflow_name=workflow_name,
+                    prompt=prompt_text,
+                    seeds=seeds,
+                    overrides=other_overrides,
+                    backend=comfy_client.backend_of(prompt_id) if prompt_id else None,
+                    duration=time.monotonic() - started if started is not None else None,
+                )
+            except Exception as e:
+                print(f"Warning: Could not record images in history: {e}")
+
     previous_images = []
     finished_naturally = False
     last_status = "Processing..."
     last_safe_images = []
+    # Everything this run puts on ComfyUI, registered with the session for cleanup
+    run = context.start_run() if context is not None else GenerationRun()
+    submissions = run.submissions
+    active_prompts = run.prompt_ids
+    last_submission = None
+
+    def submit(index):
+        nonlocal last_submission
+        item_started.setdefault(index, time.monotonic())
+        queued_workflow = prepare_workflow(
+            workflow_json, prompt_text, comfy_client, batch_overrides(index)
+        )
+        last_submission = asyncio.create_task(
+            _submit_in_order(comfy_client, queued_workflow, last_submission)
+        )
+        submissions[index] = last_submission
 
     try:
-        for i in range(batch_count):
-            # Clear skip event for this iteration
-            if skip_event:
-                skip_event.clear()
-
-            iter_overrides = overrides.copy() if overrides else {}
-
-            current_seeds = {}
-            for key, batch in seed_batches.items():
-                seed_val = batch[i]
-                iter_overrides[key] = str(seed_val)  # Store as string for overrides compatibility
-                current_seeds[key] = seed_val
-
-            seed_suffix = f" (Batch {i+1}/{batch_count})"
-
-            current_completed = []
-
-            # Manual async iteration to support skip/cancellation
-            iterator = handle_generation(
-                workflow_name, prompt_text, config, comfy_client, iter_overrides
-            ).__aiter__()
-
-            while True:
-                # Check skip signal
-                if skip_event and skip_event.is_set():
-                    break
-
-                try:
-                    # Create tasks for next update and skip signal
-                    next_task = asyncio.create_task(iterator.__anext__())
-                    tasks = [next_task]
-                    if skip_event:
-                        skip_task = asyncio.create_task(skip_event.wait())
-                        tasks.append(skip_task)
-
-                    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-
-                    # Check if skip was triggered
+        if batch_order == "completion" and pipeline_depth > 1:
+            async for display_images, status, safe_images in _generate_by_completion(
+                comfy_client,
+                batch_count,
+                pipeline_depth,
+                submit,
+                submissions,
+                skip_event,
+                previous_images,
+                finish_item,
+                max_progress_hz,
+            ):
+                last_status = status
+                last_safe_images = safe_images
+                seed_suffix = ""
+                yield display_images, status, gr.update(visible=False), gr.update(
+                    visible=True
+                ), gr.update(visible=True), gr.update(), history_update(), safe_images
+        else:
+            for i in range(batch_count):
+                # Clear skip event for this iteration
+                if skip_event:
+                    skip_event.clear()
+
+                seed_suffix = f" (Batch {i+1}/{batch_count})"
+                item_started[i] = time.monotonic()
+
+                current_completed = []
+                active_prompts.clear()
+
+                # Manual async iteration to support skip/cancellation
+                if pipeline_depth > 1:
+                    # Keep the next items queued so the GPU never waits on a round trip
+                    for j in range(i, min(i + pipeline_depth, batch_count)):
+                        if j not in submissions:
+                            submit(j)
+                    iterator = stream_generation(
+                        # Stays registered until the item ends, so a stop still cancels it
+                        _stream_submitted(comfy_client, asyncio.shield(submissions[i])),
+                        active_prompts,
+                        max_progress_hz,
+                    ).__aiter__()
+                else:
+                    iterator = handle_generation(
+                        workflow_name,
+                        prompt_text,
+                        config,
+                        comfy_client,
+                        batch_overrides(i),
+                        active_prompts,
+                        max_progress_hz,
+                    ).__aiter__()
+
+                while True:
+                    # Check skip signal
                     if skip_event and skip_event.is_set():
-                        next_task.cancel()  # Cancel pending generation task
-                        # Yield safe state (remove preview)
-                        safe_images = previous_images + current_completed
-                        yield safe_images, "Skipping...", gr.update(visible=False), gr.update(
-                            visible=True
-                        ), gr.update(visible=True), gr.update(), history_state[:], safe_images
-                        break  # Break inner loop
-
-                    # If we are here, next_task completed successfully
+                        break
+
                     try:
-                        update = next_task.result()
-                        run_completed, run_preview, status = update
-                        last_status = status
-                        current_completed = run_completed
-
-                        # Construct display list: previous + current_completed + [preview]
-                        safe_images = previous_images + current_completed
-                        last_safe_images = safe_images
-
-                        display_images = list(safe_images)
-                        if run_preview:
-                            display_images.append(run_preview)
-
-                        # Add seeds to status if available
-                        seed_info = ""
-                        # Seed info removed from status display per requirements
-                        # if current_seeds:
-                        #    seed_info = f" Seed: {list(current_seeds.values())[0]}"
-
-                        yield display_images, last_status + seed_info + seed_suffix, gr.update(
-                            visible=False
-                        ), gr.update(visible=True), gr.update(
-                            visible=True
-                        ), gr.update(), history_state[
-                            :
-                        ], safe_images
-
-                    except StopAsyncIteration:
-                        # Generator finished normally
-                        # If we finished naturally, current_completed contains the FINAL images for this run.
-                        # Update history state
-                        history_state.extend(current_completed)
+                        # Create tasks for next update and skip signal
+                        next_task = asyncio.create_task(iterator.__anext__())
+                        tasks = [next_task]
+                        if skip_event:
+                            skip_task = asyncio.create_task(skip_event.wait())
+                            tasks.append(skip_task)
+
+                        done, pending = await asyncio.wait(
+                            tasks, return_when=asyncio.FIRST_COMPLETED
+                        )
+
+                        # Check if skip was triggered
+                        if skip_event and skip_event.is_set():
+                            next_task.cancel()  # Cancel pending generation task
+                            # Interrupt or dequeue only this item's prompt
+                            submission = submissions.pop(i, None)
+                            cancel_prompts_in_background(
+                                comfy_client, active_prompts, [submission] if submission else []
+                            )
+                            active_prompts.clear()
+                            # Yield safe state (remove preview)
+                            safe_images = previous_images + current_completed
+                            yield safe_images, "Skipping...", gr.update(visible=False), gr.update(
+                                visible=True
+                            ), gr.update(visible=True), gr.update(), history_update(), safe_images
+                            break  # Break inner loop
+
+                        # If we are here, next_task completed successfully
+                        try:
+                            update = next_task.result()
+                            run_completed, run_preview, status = update
+                            last_status = status
+                            current_completed = run_completed
+
+                            # Construct display list: previous + current_completed + [preview]
+                            safe_images = previous_images + current_completed
+                            last_safe_images = safe_images
+
+                            display_images = list(safe_images)
+                            if run_preview:
+                                display_images.append(run_preview)
+
+                            # Add seeds to status if available
+                            seed_info = ""
+                            # Seed info removed from status display per requirements
+                            # if current_seeds:
+                            #    seed_info = f" Seed: {list(current_seeds.values())[0]}"
+
+                            yield display_images, last_status + seed_info + seed_suffix, gr.update(
+                                visible=False
+                            ), gr.update(visible=True), gr.update(
+                                visible=True
+                            ), gr.update(), history_update(), safe_images
+
+                        except StopAsyncIteration:
+                            # Generator finished normally
+                            # If we finished naturally, current_completed contains the FINAL images for this run.
+                            # Update history state
+                            await finish_item(
+                                i, current_completed, active_prompts[-1] if active_prompts else None
+                            )
+                            active_prompts.clear()
+                            break
+                        except Exception as e:
+                            yield last_safe_images, f"Error: {e}", gr.update(
+                                visible=True, interactive=True
+                            ), gr.update(visible=False), gr.update(
+                                visible=False
+                            ), gr.update(), history_update(), last_safe_images
+                            return  # Stop all on error
+
+                        # Cancel skip task if it's still pending
+                        if skip_event:
+                            skip_task.cancel()
+
+                    except Exception:
                         break
-                    except Exception as e:
-                        yield last_safe_images, f"Error: {e}", gr.update(
-                            visible=True, interactive=True
-                        ), gr.update(visible=False), gr.update(
-                            visible=False
-                        ), gr.update(), history_state[
-                            :
-                        ], last_safe_images
-                        return  # Stop all on error
-
-                    # Cancel skip task if it's still pending
-                    if skip_event:
-                        skip_task.cancel()
-
-                except Exception:
-                    break
-
-            if not (skip_event and skip_event.is_set()):
-                previous_images.extend(current_completed)
-            else:
-                # If skipped, ensure we keep whatever was completed
-                previous_images.extend(current_completed)
-                # Update safe images state one last time for this batch to ensure sync
-                last_safe_images = previous_images
+
+                submissions.pop(i, None)
+                if not (skip_event and skip_event.is_set()):
+                    previous_images.extend(current_completed)
+                else:
+                    # If skipped, ensure we keep whatever was completed
+                    previous_images.extend(current_completed)
+                    # Update safe images state one last time for this batch to ensure sync
+                    last_safe_images = previous_images
 
         finished_naturally = True
     except asyncio.CancelledError:
+        # Release this run's prompts before anything else can be interrupted
+        run.release(comfy_client)
         # Yield safe state on cancel to ensure preview is removed
         yield last_safe_images, "Interrupted", gr.update(visible=True, interactive=True), gr.update(
             visible=False
-        ), gr.update(visible=False), gr.update(), history_state[:], last_safe_images
+        ), gr.update(visible=False), gr.update(), history_update(), last_safe_images
         raise
     finally:
+        # Release anything this run still owns on ComfyUI (stop or error)
+        run.release(comfy_client)
+        if context is not None:
+            context.finish_run(run)
         if finished_naturally:
             # Add seeds to status if available
             seed_info = ""
@@ -438,33 +805,164 @@ async def process_generation(
                 seed_suffix if "seed_suffix" in locals() else ""
             ), gr.update(visible=True, interactive=True), gr.update(visible=False), gr.update(
                 visible=False
-            ), gr.update(), history_state[
-                :
-            ], previous_images
+            ), gr.update(), history_update(), previous_images
+
+
+def show_renditions(update):
+    # Galleries show downscaled copies; the states keep the originals for download
+    gallery, history = update[0], update[6]
+    if isinstance(gallery, list):
+        gallery = renditions.shown_list(gallery, "display")
+    if isinstance(history, list):
+        history = renditions.shown_list(history, "thumbnail")
+    return (gallery, *update[1:6], history, *update[7:])
+
+
+def original_for_selection(originals, evt: gr.SelectData):
+    if originals and isinstance(evt.index, int) and 0 <= evt.index < len(originals):
+        return gr.update(value=originals[evt.index], visible=True)
+    return gr.update(visible=False)
+
+
+def browser_state_secret(cache_dir):
+    """The key BrowserState values are encrypted with, kept so they survive restarts."""
+    path = os.path.join(cache_dir, "browser-state.key")
+    with contextlib.suppress(OSError):
+        with open(path, "r") as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    secret = secrets.token_hex(16)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            f.write(secret)
+    except OSError as e:
+        print(f"Warning: Could not save browser state key: {e}")
+    return secret
 
 
-def create_ui(config, comfy_client):
-    workflow_names = [w["name"] for w in config.workflows]
-    object_info = comfy_client.get_object_info()
+def assign_browser_id(browser_id):
+    # A random id per browser, unguessable so nobody can claim someone else's history
+    return browser_id or uuid.uuid4().hex
 
-    # Event for skip signaling
-    skip_event = asyncio.Event()
 
-    async def on_generate(workflow_name, prompt_text, overrides, batch_count, history):
+def _configured_workflows(config):
+    workflows = []
+    for workflow_info in config.workflows:
+        try:
+            workflows.append(load_workflow(workflow_info["path"]))
+        except Exception as e:
+            print(f"Warning: Could not read workflow {workflow_info['path']}: {e}")
+    return workflows
+
+
+def create_ui(config, comfy_client, backend_status=None):
+    workflow_names = [w["name"] for w in config.workflows]
+    # Fetch node definitions for the configured workflows only, others on first use.
+    # A snapshot from the last run serves them while ComfyUI is slow or down. When
+    # the backend is still being probed, nothing here waits for it.
+    cache_dir = getattr(config, "cache_dir", None)
+    snapshot = ObjectInfoSnapshot(cache_dir, comfy_client.base_url) if cache_dir else None
+    object_info = load_object_info_index(
+        comfy_client, _configured_workflows(config), snapshot, block=backend_status is None
+    )
+
+    image_memory.budget_bytes = (
+        getattr(config, "image_memory_mb", DEFAULT_IMAGE_MEMORY_MB) * 1024 * 1024
+    )
+    if isinstance(comfy_client, JobScheduler):
+        # Events of prompts running ahead of the UI count against the same budget
+        comfy_client.memory = image_memory
+    output_store.max_bytes = (
+        getattr(config, "output_cache_mb", DEFAULT_OUTPUT_CACHE_MB) * 1024 * 1024
+    )
+    preview_store.max_age = getattr(config, "preview_max_age", DEFAULT_PREVIEW_MAX_AGE)
+
+    # Every final image is also kept in the archive directory, if one is configured
+    archive_dir = getattr(config, "archive_dir", None)
+    archive = OutputArchive(archive_dir) if archive_dir else None
+
+    # And recorded in the history database, which outlives sessions and restarts
+    history_db_path = getattr(config, "history_db", None)
+    history_db = HistoryDB(history_db_path) if history_db_path else None
+    all_workflows = "All workflows"
+
+    shared_history = getattr(config, "shared_history", False)
+    browser_secret = browser_state_secret(cache_dir) if cache_dir else None
+
+    async def history_page(workflow_filter, cursor, browser_id, request):
+        rows, next_cursor = await asyncio.to_thread(
+            history_db.page,
+            owner=None if shared_history else history_owner(request, browser_id),
+            workflow_name=None if workflow_filter in (None, all_workflows) else workflow_filter,
+            cursor=cursor,
+        )
+        originals = [row["path"] for row in rows]
+        # Archive copies carry the metadata; thumbnails come from the content-addressed
+        # original while it is still in Gradio's cache, else from the copy
+        sources = [
+            row["source"] if row["source"] and os.path.exists(row["source"]) else row["path"]
+            for row in rows
+        ]
+        await asyncio.gather(*(renditions.render(source, ("thumbnail",)) for source in sources))
+        return originals, renditions.shown_list(sources, "thumbnail"), next_cursor
+
+    # Skip signals and in-flight prompts, kept separately for every browser session
+    sessions = SessionRegistry()
+
+    def session_context(request):
+        return sessions.get(request.session_hash if request else None)
+
+    def history_owner(request, browser_id=None):
+        # Signed in users keep their history; anonymous ones keep theirs per browser,
+        # across reloads and restarts, once it has been given an id
+        if request is None:
+            return browser_id
+        return request.username or browser_id or request.session_hash
+
+    async def on_generate(
+        workflow_name,
+        prompt_text,
+        overrides,
+        batch_count,
+        history,
+        browser_id,
+        request: gr.Request,
+    ):
+        context = session_context(request)
         # Clear skip event at start of run
-        skip_event.clear()
+        context.skip_event.clear()
+        pipeline_depth = getattr(config, "pipeline_depth", 1)
+        if getattr(config, "distribute_batches", False):
+            # Queue the whole batch at once so a pool can spread it over every backend
+            pipeline_depth = int(batch_count)
+        client = comfy_client
+        if isinstance(comfy_client, JobScheduler):
+            # Submit as this session so the scheduler can share backends fairly, and
+            # let single images overtake batches
+            priority = INTERACTIVE if int(batch_count) == 1 else BULK
+            client = comfy_client.for_owner(request.session_hash if request else None, priority)
         async for update in process_generation(
             workflow_name,
             prompt_text,
             overrides,
             batch_count,
             config,
-            comfy_client,
+            client,
             object_info,
             history,
-            skip_event,
+            context.skip_event,
+            pipeline_depth,
+            getattr(config, "batch_order", "batch"),
+            context,
+            getattr(config, "max_progress_hz", DEFAULT_MAX_PROGRESS_HZ),
+            getattr(config, "history_limit", DEFAULT_HISTORY_LIMIT),
+            archive,
+            history_db,
+            history_owner(request, browser_id),
         ):
-            yield update
+            yield show_renditions(update)
 
     css = """
     #gallery {
@@ -520,14 +1018,18 @@ def create_ui(config, comfy_client):
             overrides_store = gr.JSON(value={}, visible=True, elem_id="overrides-store")
             history_state = gr.State(value=[])
             safe_gallery_state = gr.State(value=[])
+            # Identifies an anonymous visitor's browser to the history database
+            browser_id = gr.BrowserState(
+                None, storage_key="simplui-browser-id", secret=browser_secret
+            )
+            demo.load(fn=assign_browser_id, inputs=[browser_id], outputs=[browser_id])
 
             def update_prompt_on_change(workflow_name):
                 if not workflow_name:
                     return ""
                 try:
                     workflow_info = next(w for w in config.workflows if w["name"] == workflow_name)
-                    with open(workflow_info["path"], "r") as f:
-                        workflow_json = json.load(f)
+                    workflow_json = load_workflow(workflow_info["path"])
                     return get_prompt_default_value(workflow_json)
                 except Exception as e:
                     print(f"Error updating prompt: {e}")
@@ -542,6 +1044,9 @@ def create_ui(config, comfy_client):
                         object_fit="contain",
                         height="70vh",
                     )
+                    download_original = gr.DownloadButton(
+                        "Download full resolution", visible=False, size="sm"
+                    )
                     status_text = gr.Markdown("Ready")
 
                     with gr.Row(equal_height=True):
@@ -638,13 +1143,12 @@ def create_ui(config, comfy_client):
                                     return
 
                                 try:
-                                    with open(workflow_info["path"], "r") as f:
-                                        workflow_json = json.load(f)
+                                    workflow_json = load_workflow(workflow_info["path"])
                                 except Exception as e:
                                     gr.Markdown(f"Error loading workflow: {e}")
                                     return
 
-                                extracted = extract_workflow_inputs(
+                                extracted = cached_workflow_inputs(
                                     workflow_json, object_info, config.sliders
                                 )
 
@@ -863,7 +1367,7 @@ def create_ui(config, comfy_client):
 
                                             if inp["type"] == "enum":
                                                 comp = gr.Dropdown(
-                                                    choices=inp["options"],
+                                                    choices=list(inp["options"]),
                                                     label=inp["name"],
                                                     value=current_val,
                                                     interactive=True,
@@ -987,7 +1491,7 @@ def create_ui(config, comfy_client):
                                                     outputs=[overrides_store],
                                                 )
 
-                        with gr.Tab("History"):
+                        with gr.Tab("History") as history_tab:
                             history_gallery = gr.Gallery(
                                 label="Session History",
                                 show_label=False,
@@ -996,6 +1500,36 @@ def create_ui(config, comfy_client):
                                 elem_id="history-gallery",
                                 interactive=False,
                             )
+                            history_download = gr.DownloadButton(
+                                "Download full resolution", visible=False, size="sm"
+                            )
+                            if history_db is not None:
+                                with gr.Row():
+                                    archive_filter = gr.Dropdown(
+                                        choices=[all_workflows] + workflow_names,
+                                        value=all_workflows,
+                                        show_label=False,
+                                        container=False,
+                                        scale=3,
+                                    )
+                                    archive_older_btn = gr.Button(
+                                        "Load older", size="sm", visible=False, scale=1
+                                    )
+                                archive_gallery = gr.Gallery(
+                                    label="All Generations",
+                                    object_fit="contain",
+                                    height="70vh",
+                                    elem_id="archive-gallery",
+                                    interactive=False,
+                                )
+                                archive_download = gr.DownloadButton(
+                                    "Download full resolution", visible=False, size="sm"
+                                )
+                                # Originals and thumbnails of the rows shown, and the keyset
+                                # cursor of the next page
+                                archive_originals_state = gr.State(value=[])
+                                archive_thumbnails_state = gr.State(value=[])
+                                archive_cursor_state = gr.State(value=None)
 
                 advanced_toggle.change(
                     fn=lambda x: gr.update(visible=x),
@@ -1011,6 +1545,7 @@ def create_ui(config, comfy_client):
                         overrides_store,
                         batch_count_slider,
                         history_state,
+                        browser_id,
                     ],
                     outputs=[
                         output_gallery,
@@ -1022,17 +1557,93 @@ def create_ui(config, comfy_client):
                         history_gallery,
                         safe_gallery_state,
                     ],
+                    concurrency_limit=getattr(config, "concurrency_limit", 1),
                 )
 
                 gen_event.cancels = [gen_event]
 
+                # The full resolution file is only sent when someone asks for it
+                output_gallery.select(
+                    fn=original_for_selection,
+                    inputs=[safe_gallery_state],
+                    outputs=[download_original],
+                )
+                history_gallery.select(
+                    fn=original_for_selection,
+                    inputs=[history_state],
+                    outputs=[history_download],
+                )
+
+                if history_db is not None:
+
+                    async def first_history_page(workflow_filter, browser_id, request: gr.Request):
+                        originals, thumbnails, cursor = await history_page(
+                            workflow_filter, None, browser_id, request
+                        )
+                        return (
+                            thumbnails,
+                            originals,
+                            thumbnails,
+                            cursor,
+                            gr.update(visible=cursor is not None),
+                            gr.update(visible=False),
+                        )
+
+                    async def older_history_page(
+                        workflow_filter,
+                        originals,
+                        thumbnails,
+                        cursor,
+                        browser_id,
+                        request: gr.Request,
+                    ):
+                        older, older_thumbnails, cursor = await history_page(
+                            workflow_filter, cursor, browser_id, request
+                        )
+                        thumbnails = thumbnails + older_thumbnails
+                        return (
+                            thumbnails,
+                            originals + older,
+                            thumbnails,
+                            cursor,
+                            gr.update(visible=cursor is not None),
+                        )
+
+                    archive_outputs = [
+                        archive_gallery,
+                        archive_originals_state,
+                        archive_thumbnails_state,
+                        archive_cursor_state,
+                        archive_older_btn,
+                    ]
+                    # Only queried when someone opens the tab, a page at a time
+                    for trigger in (history_tab.select, archive_filter.change):
+                        trigger(
+                            fn=first_history_page,
+                            inputs=[archive_filter, browser_id],
+                            outputs=archive_outputs + [archive_download],
+                        )
+                    archive_older_btn.click(
+                        fn=older_history_page,
+                        inputs=[
+                            archive_filter,
+                            archive_originals_state,
+                            archive_thumbnails_state,
+                            archive_cursor_state,
+                            browser_id,
+                        ],
+                        outputs=archive_outputs,
+                    )
+                    archive_gallery.select(
+                        fn=original_for_selection,
+                        inputs=[archive_originals_state],
+                        outputs=[archive_download],
+                    )
+
                 def stop_generation(safe_images):
-                    try:
-                        comfy_client.interrupt()
-                    except Exception:
-                        pass
+                    # Cancelling gen_event releases this session's prompts on ComfyUI
                     return (
-                        safe_images,
+                        renditions.shown_list(safe_images, "display"),
                         gr.update(value="Interrupted"),
                         gr.update(visible=True, interactive=True),
                         gr.update(visible=False),
@@ -1046,9 +1657,8 @@ def create_ui(config, comfy_client):
                     cancels=[gen_event],
                 )
 
-                def on_skip():
-                    skip_event.set()
-                    comfy_client.interrupt()
+                def on_skip(request: gr.Request):
+                    session_context(request).skip_event.set()
 
                 skip_btn.click(
                     fn=on_skip,
@@ -1056,6 +1666,47 @@ def create_ui(config, comfy_client):
                     outputs=[],
                 )
 
+                async def on_unload(request: gr.Request):
+                    # Nobody is waiting for this session's prompts any more
+                    context = sessions.remove(request.session_hash)
+                    if context is not None:
+                        context.release(comfy_client)
+                        output_store.retain(context, ())
+                    if isinstance(comfy_client, JobScheduler):
+                        comfy_client.forget(request.session_hash)
+
+                demo.unload(on_unload)
+
+                def image_memory_usage() -> dict:
+                    return image_memory.usage()
+
+                # Image bytes buffered across all sessions, for monitoring
+                gr.api(image_memory_usage, api_name="image_memory")
+
+                if archive is not None:
+
+                    def output_archive_stats() -> dict:
+                        return archive.stats()
+
+                    # Images waiting to be archived, for monitoring
+                    gr.api(output_archive_stats, api_name="output_archive")
+
+                if backend_status is not None:
+                    # Show the connection state until ComfyUI answers, then stop polling
+                    backend_timer = gr.Timer(1.0, active=not backend_status.connected)
+
+                    def poll_backend_status():
+                        if backend_status.connected:
+                            return backend_status.describe(), gr.Timer(active=False)
+                        return backend_status.describe(), gr.Timer()
+
+                    backend_timer.tick(
+                        fn=poll_backend_status,
+                        inputs=[],
+                        outputs=[status_text, backend_timer],
+                    )
+                    demo.load(fn=backend_status.describe, inputs=[], outputs=[status_text])
+
     demo.css = css
     demo.js = shortcut_js
     return demo
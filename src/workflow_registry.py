@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError("shared workflows are read-only, copy the part you change")
+
+
+class ReadOnlyDict(dict):
+    """A dict that refuses writes; copy.copy and copy.deepcopy give writable ones.
+
+    Still a dict, so JSON encoding and isinstance checks take it as is.
+    """
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __reduce__(self):
+        return freeze, (thaw(self),)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+class ReadOnlyList(list):
+    """A list that refuses writes, for the links and list values of a shared workflow."""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self):
+        return list(self)
+
+    def __reduce__(self):
+        return freeze, (thaw(self),)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(value):
+    """Returns value with every dict and list in it made read-only."""
+    if isinstance(value, dict):
+        return ReadOnlyDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return ReadOnlyList(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Returns a plain, writable deep copy of a frozen value."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [thaw(item) for item in value]
+    return value
+
+
+class _Entry:
+    def __init__(self, stamp, digest, workflow):
+        self.stamp = stamp
+        self.digest = digest
+        self.workflow = workflow
+
+
+class WorkflowRegistry:
+    """Parses each workflow file once and re-parses only after it changes on disk.
+
+    The returned workflows are shared between callers, so they come frozen down to
+    every node input; merge_workflow_overrides builds submissions from copies.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    @staticmethod
+    def _stamp(stat):
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, path):
+        try:
+            stamp = self._stamp(os.stat(path))
+        except OSError:
+            # Nothing to validate a cache entry against; read it the plain way so
+            # the caller sees the usual error if the file is really gone
+            self._entries.pop(path, None)
+            with open(path, "r") as f:
+                return json.load(f)
+
+        entry = self._entries.get(path)
+        if entry is not None and entry.stamp == stamp:
+            return entry.workflow
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).digest()
+        if entry is not None and entry.digest == digest:
+            # Touched but not edited, the parsed graph is still good
+            entry.stamp = stamp
+            return entry.workflow
+
+        workflow = freeze(json.loads(raw))
+        self._entries[path] = _Entry(stamp, digest, workflow)
+        return workflow
+
+    def invalidate(self, path=None):
+        if path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(path, None)
+
+
+# Shared by every session of the UI
+workflow_registry = WorkflowRegistry()
+
+
+def load_workflow(path):
+    return workflow_registry.load(path)
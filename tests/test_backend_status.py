@@ -0,0 +1,35 @@
+import time
+import backend_status
+from backend_status import BackendStatus, CONNECTED, CONNECTING, UNREACHABLE
+from unittest.mock import MagicMock, patch
+
+
+def wait_for_state(status, state, timeout=2):
+    deadline = time.monotonic() + timeout
+    while status.state != state and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return status.state == state
+
+
+def test_connected_backend_reports_ready():
+    client = MagicMock()
+    client.check_connection.return_value = True
+    status = BackendStatus(client, "http://gpu0:8188")
+    assert status.state == CONNECTING
+    assert status.describe() == "Connecting to ComfyUI..."
+
+    status.start()
+
+    assert wait_for_state(status, CONNECTED)
+    assert status.describe() == "Ready"
+
+
+def test_unreachable_backend_retried_until_it_answers():
+    client = MagicMock()
+    client.check_connection.side_effect = [False, True]
+
+    with patch.object(backend_status, "PROBE_RETRY_INTERVAL", 0.2):
+        status = BackendStatus(client, "http://gpu0:8188").start()
+        assert wait_for_state(status, UNREACHABLE)
+        assert "not reachable at http://gpu0:8188" in status.describe()
+        assert wait_for_state(status, CONNECTED)
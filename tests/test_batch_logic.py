@@ -4,10 +4,13 @@ import json
 import sys
 import os
 import copy
+import asyncio
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
 
+import ui
 from ui import process_generation
+from seed_utils import generate_batch_seeds
 
 
 @pytest.mark.asyncio
@@ -45,8 +48,7 @@ async def test_batch_generation_calls():
         mock_file_open.return_value = mock_f
 
         with patch("json.load", return_value=workflow_data):
-            with patch("ui.Image.open") as mock_img_open:
-                mock_img_open.return_value = "ImageObject"
+            with patch.object(ui.output_store, "write", return_value="ImageObject"):
 
                 updates = []
                 async for update in process_generation(
@@ -92,16 +94,11 @@ async def test_batch_aggregation_with_previews():
         mock_file_open.return_value = mock_f
 
         with patch("json.load", return_value=workflow_data):
-            with patch("ui.Image.open") as mock_img_open:
-                # Mock Image objects with names for easy identification
-                def side_effect(io_bytes):
-                    if io_bytes.getvalue() == b"prev":
-                        return "Preview"
-                    if io_bytes.getvalue() == b"final":
-                        return "Final"
-                    return "Unknown"
-
-                mock_img_open.side_effect = side_effect
+            # Stand-in paths for easy identification
+            with (
+                patch.object(ui.output_store, "write", return_value="Final"),
+                patch.object(ui.preview_store, "write", return_value="Preview"),
+            ):
 
                 updates = []
                 async for update in process_generation(
@@ -149,7 +146,9 @@ async def test_process_generation_history_accumulation():
     with patch("builtins.open", new_callable=MagicMock) as mock_file:
         mock_file.return_value.__enter__.return_value = mock_file
         with patch("json.load", return_value=workflow_data):
-            with patch("ui.Image.open", side_effect=lambda x: f"Img-{x.getvalue().decode()}"):
+            with patch.object(
+                ui.output_store, "write", side_effect=lambda data: f"Img-{bytes(data).decode()}"
+            ):
                 updates = []
                 async for update in process_generation(
                     "test", "", {}, 2, config, comfy_client, {}, history
@@ -169,3 +168,444 @@ async def test_process_generation_history_accumulation():
                 # Previews should NOT be in history
                 for h in history_yields:
                     assert "Img-p1" not in h
+
+
+@pytest.mark.asyncio
+async def test_output_store_keeps_images_other_sessions_still_show(tmp_path):
+    from output_store import OutputStore
+    from session_registry import GenerationContext
+
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+    images = iter([b"\xff\xd8first", b"\xff\xd8second", b"\xff\xd8third"])
+    comfy_client = MagicMock()
+
+    async def mock_gen(workflow):
+        yield {"type": "image", "data": next(images)}
+
+    comfy_client.generate_image = MagicMock(side_effect=mock_gen)
+    # Room for one image only
+    store = OutputStore(str(tmp_path), max_bytes=len(b"\xff\xd8second"))
+
+    async def generate(context, history, batch_count):
+        async for _ in process_generation(
+            "test", "", {}, batch_count, config, comfy_client, {}, history, context=context
+        ):
+            pass
+
+    first_session, second_session = GenerationContext(), GenerationContext()
+    first_history, second_history = [], []
+    workflow = {"1": {"inputs": {}, "class_type": "Node"}}
+    with patch("ui.load_workflow", return_value=workflow):
+        with patch.object(ui, "output_store", store):
+            await generate(first_session, first_history, 1)
+            # Another session fills the store well past its budget
+            await generate(second_session, second_history, 2)
+
+    # The first session's history still points at its image, so it was not deleted
+    assert os.path.exists(first_history[0])
+    assert all(os.path.exists(path) for path in second_history)
+
+    # Once the session is gone its images can go too
+    store.retain(first_session, ())
+    store.write(b"\xff\xd8fourth")
+    assert not os.path.exists(first_history[0])
+
+
+@pytest.mark.asyncio
+async def test_history_sent_only_when_it_changes():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+    comfy_client = MagicMock()
+    outputs = iter(["Img-1", "Img-2", "Img-3"])
+
+    async def mock_gen(workflow):
+        yield {"type": "progress", "value": 1, "max": 2}
+        yield {"type": "image", "data": b"final"}
+
+    comfy_client.generate_image = MagicMock(side_effect=mock_gen)
+
+    history = ["Img-0"]
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value={"1": {"inputs": {}, "class_type": "Node"}}):
+            with patch.object(ui.output_store, "write", side_effect=lambda data: next(outputs)):
+                history_yields = [
+                    update[6]
+                    async for update in process_generation(
+                        "test", "", {}, 3, config, comfy_client, {}, history, history_limit=2
+                    )
+                ]
+
+    sent = [h for h in history_yields if isinstance(h, list)]
+    # One update per finished item, trimmed to the newest two
+    assert sent == [["Img-0", "Img-1"], ["Img-1", "Img-2"], ["Img-2", "Img-3"]]
+    assert history == ["Img-2", "Img-3"]
+    assert len(history_yields) > len(sent)
+
+
+@pytest.mark.asyncio
+async def test_finished_images_queued_for_the_archive():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+    comfy_client = MagicMock()
+    comfy_client.find_node_by_title.return_value = None
+
+    async def mock_gen(workflow):
+        yield {"type": "image", "data": b"final"}
+
+    comfy_client.generate_image = MagicMock(side_effect=mock_gen)
+    archive = MagicMock()
+    workflow_data = {
+        "1": {"inputs": {"seed": 0}, "class_type": "KSampler", "_meta": {"title": "KSampler"}}
+    }
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value=workflow_data):
+            with patch.object(ui.output_store, "write", return_value="Final"):
+                async for _ in process_generation(
+                    "test",
+                    "a cat",
+                    {"1.seed": "100", "1.cfg": "7"},
+                    2,
+                    config,
+                    comfy_client,
+                    {},
+                    [],
+                    archive=archive,
+                ):
+                    pass
+
+    assert archive.save.call_count == 2
+    seeds = generate_batch_seeds(100, 2)
+    for call_args, seed in zip(archive.save.call_args_list, seeds):
+        image, metadata = call_args.args
+        assert image == "Final"
+        assert metadata["prompt"] == "a cat"
+        assert metadata["seeds"] == {"1.seed": seed}
+        assert metadata["overrides"]["1.cfg"] == "7"
+        assert metadata["workflow"]["1"]["inputs"]["seed"] == seed
+
+
+@pytest.mark.asyncio
+async def test_finished_images_recorded_in_history_db():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+    comfy_client = MagicMock()
+    comfy_client.find_node_by_title.return_value = None
+    comfy_client.backend_of.return_value = "http://gpu1:8188"
+
+    async def mock_gen(workflow):
+        yield {"type": "queued", "prompt_id": "p1"}
+        yield {"type": "image", "data": b"final"}
+
+    comfy_client.generate_image = MagicMock(side_effect=mock_gen)
+    archive = MagicMock()
+    archive.save.return_value = "outputs/final.png"
+    history_db = MagicMock()
+    workflow_data = {
+        "1": {"inputs": {"seed": 0}, "class_type": "KSampler", "_meta": {"title": "KSampler"}}
+    }
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value=workflow_data):
+            with patch.object(ui.output_store, "write", return_value="Final"):
+                async for _ in process_generation(
+                    "test",
+                    "a cat",
+                    {"1.seed": "100"},
+                    1,
+                    config,
+                    comfy_client,
+                    {},
+                    [],
+                    archive=archive,
+                    history_db=history_db,
+                    owner="alice",
+                ):
+                    pass
+
+    history_db.add.assert_called_once()
+    call_args = history_db.add.call_args
+    assert call_args.args[0] == [("outputs/final.png", "Final")]
+    assert call_args.kwargs["owner"] == "alice"
+    assert call_args.kwargs["workflow_name"] == "test"
+    assert call_args.kwargs["prompt"] == "a cat"
+    assert call_args.kwargs["seeds"] == {"1.seed": generate_batch_seeds(100, 1)[0]}
+    assert call_args.kwargs["backend"] == "http://gpu1:8188"
+    assert call_args.kwargs["duration"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_pipelined_batch_queues_ahead_in_order():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+
+    comfy_client = MagicMock()
+    comfy_client.inject_prompt = MagicMock(return_value=True)
+    queued = []
+    streamed = []
+
+    async def mock_queue(workflow):
+        queued.append(workflow["1"]["inputs"]["seed"])
+        return f"prompt-{len(queued)}"
+
+    async def mock_stream(prompt_id):
+        await asyncio.sleep(0.01)
+        streamed.append((prompt_id, len(queued)))
+        yield {"type": "image", "data": prompt_id.encode()}
+
+    comfy_client.queue_prompt = AsyncMock(side_effect=mock_queue)
+    comfy_client.stream_prompt = MagicMock(side_effect=mock_stream)
+    comfy_client.cancel_prompts = AsyncMock()
+
+    workflow_data = {
+        "1": {"inputs": {"seed": 0}, "class_type": "KSampler", "_meta": {"title": "KSampler"}}
+    }
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value=workflow_data):
+            with patch.object(ui.output_store, "write", side_effect=lambda data: data.decode()):
+                updates = []
+                async for update in process_generation(
+                    "test",
+                    "",
+                    {"1.seed": "100"},
+                    3,
+                    config,
+                    comfy_client,
+                    {},
+                    [],
+                    pipeline_depth=2,
+                ):
+                    updates.append(update)
+
+    # Each item keeps its precomputed batch seed, submitted in batch order
+    assert queued == generate_batch_seeds(100, 3)
+    # The next prompt is already queued when an item starts streaming
+    assert streamed == [("prompt-1", 2), ("prompt-2", 3), ("prompt-3", 3)]
+    # Results still arrive in batch order
+    assert updates[-1][0] == ["prompt-1", "prompt-2", "prompt-3"]
+    comfy_client.cancel_prompts.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_pipelined_batch_cancel_discards_queued_ahead():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+
+    comfy_client = MagicMock()
+    comfy_client.queue_prompt = AsyncMock(side_effect=["prompt-1", "prompt-2", "prompt-3"])
+    comfy_client.cancel_prompts = AsyncMock()
+
+    async def mock_stream(prompt_id):
+        yield {"type": "progress", "value": 1, "max": 10}
+        await asyncio.sleep(3600)
+
+    comfy_client.stream_prompt = MagicMock(side_effect=mock_stream)
+
+    async def run():
+        async for _ in process_generation(
+            "test", "", {}, 3, config, comfy_client, {}, [], pipeline_depth=3
+        ):
+            pass
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value={"1": {"inputs": {}, "class_type": "Node"}}):
+            task = asyncio.create_task(run())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.05)
+
+    # The streamed item and everything queued ahead of it are released together
+    comfy_client.cancel_prompts.assert_awaited_once_with(["prompt-1", "prompt-2", "prompt-3"])
+    comfy_client.interrupt.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_pipelined_skip_cancels_submission_once_queued():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+
+    comfy_client = MagicMock()
+    comfy_client.cancel_prompts = AsyncMock()
+    accepted = asyncio.Event()
+    queued = []
+
+    async def mock_queue(workflow):
+        # The POST is already on its way when the skip arrives
+        await accepted.wait()
+        queued.append(f"prompt-{len(queued) + 1}")
+        return queued[-1]
+
+    async def mock_stream(prompt_id):
+        yield {"type": "image", "data": prompt_id.encode()}
+
+    comfy_client.queue_prompt = AsyncMock(side_effect=mock_queue)
+    comfy_client.stream_prompt = MagicMock(side_effect=mock_stream)
+    skip_event = asyncio.Event()
+
+    async def run():
+        return [
+            update
+            async for update in process_generation(
+                "test", "", {}, 2, config, comfy_client, {}, [], skip_event, pipeline_depth=2
+            )
+        ]
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value={"1": {"inputs": {}, "class_type": "Node"}}):
+            with patch.object(ui.output_store, "write", side_effect=lambda data: data.decode()):
+                task = asyncio.create_task(run())
+                await asyncio.sleep(0.05)
+                skip_event.set()
+                await asyncio.sleep(0.05)
+                accepted.set()
+                updates = await task
+                await asyncio.sleep(0.05)
+
+    # The skipped item's prompt is not lost in flight; it is cancelled once ComfyUI has it
+    assert queued == ["prompt-1", "prompt-2"]
+    comfy_client.cancel_prompts.assert_awaited_once_with(["prompt-1"])
+    assert updates[-1][0] == ["prompt-2"]
+
+
+@pytest.mark.asyncio
+async def test_completion_order_lists_fastest_items_first():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+
+    comfy_client = MagicMock()
+    comfy_client.queue_prompt = AsyncMock(side_effect=["slow", "fast", "medium"])
+    durations = {"slow": 0.3, "fast": 0.05, "medium": 0.15}
+
+    async def mock_stream(prompt_id):
+        await asyncio.sleep(durations[prompt_id])
+        yield {"type": "image", "data": prompt_id.encode()}
+
+    comfy_client.stream_prompt = MagicMock(side_effect=mock_stream)
+    history = []
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value={"1": {"inputs": {}, "class_type": "Node"}}):
+            with patch.object(ui.output_store, "write", side_effect=lambda data: data.decode()):
+                updates = []
+                async for update in process_generation(
+                    "test",
+                    "",
+                    {},
+                    3,
+                    config,
+                    comfy_client,
+                    {},
+                    history,
+                    pipeline_depth=3,
+                    batch_order="completion",
+                ):
+                    updates.append(update)
+
+    # All three ran concurrently and were listed as they finished
+    assert updates[-1][0] == ["fast", "medium", "slow"]
+    assert history == ["fast", "medium", "slow"]
+    assert "(3/3 done)" in updates[-1][1]
+
+
+@pytest.mark.asyncio
+async def test_skip_arriving_with_an_item_end_keeps_the_end():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+    skip_event = asyncio.Event()
+
+    comfy_client = MagicMock()
+    comfy_client.queue_prompt = AsyncMock(side_effect=["fast", "shown"])
+    comfy_client.cancel_prompts = AsyncMock()
+
+    async def mock_collect(index, events, updates, max_progress_hz):
+        if index == 1:
+            await updates.put((1, ([], "preview.jpg", "Generating...")))
+            await asyncio.sleep(1)
+        else:
+            await updates.put((0, (["fast"], None, "Image received")))
+            await asyncio.sleep(0.05)
+            # Pressed as the fast item ends, while the other one is on screen
+            skip_event.set()
+        await updates.put((index, None))
+
+    history = []
+
+    async def run():
+        async for _ in process_generation(
+            "test",
+            "",
+            {},
+            2,
+            config,
+            comfy_client,
+            {},
+            history,
+            skip_event,
+            pipeline_depth=2,
+            batch_order="completion",
+        ):
+            pass
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value={"1": {"inputs": {}, "class_type": "Node"}}):
+            with patch.object(ui, "_collect_item", mock_collect):
+                await asyncio.wait_for(run(), timeout=0.5)
+
+    assert history == ["fast"]
+
+
+@pytest.mark.asyncio
+async def test_new_node_classes_fetched_off_the_event_loop():
+    from object_info_index import ObjectInfoIndex
+    import threading
+
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+    comfy_client = MagicMock()
+    comfy_client.find_node_by_title.return_value = None
+
+    async def mock_gen(workflow):
+        yield {"type": "image", "data": b"final"}
+
+    comfy_client.generate_image = MagicMock(side_effect=mock_gen)
+    loader_threads = []
+
+    def loader(class_type):
+        loader_threads.append(threading.current_thread())
+        return {}
+
+    object_info = ObjectInfoIndex(loader=loader)
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value={"1": {"inputs": {}, "class_type": "NewNode"}}):
+            with patch.object(ui.output_store, "write", return_value="Final"):
+                async for _ in process_generation(
+                    "test", "", {}, 1, config, comfy_client, object_info, []
+                ):
+                    pass
+
+    assert len(loader_threads) == 1
+    assert loader_threads[0] is not threading.main_thread()
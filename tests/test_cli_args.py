@@ -15,6 +15,14 @@ def test_parse_args_none():
         assert args.comfy_addr is None
         assert args.listen_addr is None
         assert args.config == "config.json"
+        assert args.startup_profile is False
+
+
+def test_parse_args_startup_profile():
+    from main import parse_args
+
+    with patch.object(sys, "argv", ["main.py", "--startup-profile"]):
+        assert parse_args().startup_profile is True
 
 
 def test_parse_args_all():
@@ -1,5 +1,6 @@
 import pytest
 import requests
+import httpx
 import json
 from comfy_client import ComfyClient
 from unittest.mock import patch, Mock, AsyncMock
@@ -58,7 +59,7 @@ def test_submit_workflow_failure():
 
         with pytest.raises(Exception) as excinfo:
             client.submit_workflow(workflow, client_id)
-        
+
         assert "ComfyUI Error (400)" in str(excinfo.value)
         assert "Invalid workflow" in str(excinfo.value)
 
@@ -104,34 +105,6 @@ def test_inject_prompt():
     assert success is False
 
 
-def test_interrupt_success():
-
-    client = ComfyClient("http://localhost:8188")
-
-    with patch("requests.post") as mock_post:
-
-        mock_post.return_value.status_code = 200
-
-        client.interrupt()
-
-        mock_post.assert_called_once_with("http://localhost:8188/interrupt", timeout=5)
-
-
-def test_clear_queue_success():
-
-    client = ComfyClient("http://localhost:8188")
-
-    with patch("requests.post") as mock_post:
-
-        mock_post.return_value.status_code = 200
-
-        client.clear_queue()
-
-        mock_post.assert_called_once_with(
-            "http://localhost:8188/queue", json={"clear": True}, timeout=5
-        )
-
-
 def test_get_object_info_success():
 
     client = ComfyClient("http://localhost:8188")
@@ -172,3 +145,69 @@ def test_get_object_info_failure():
         info = client.get_object_info()
 
         assert info == {}
+
+
+def test_get_object_info_for_fetches_each_class():
+    client = ComfyClient("http://localhost:8188")
+
+    def fake_get(url, timeout):
+        class_type = url.rsplit("/", 1)[1]
+        response = Mock(status_code=200)
+        response.json.return_value = {class_type: {"input": {}}}
+        return response
+
+    with patch("requests.get", side_effect=fake_get) as mock_get:
+        info = client.get_object_info_for(["KSampler", "VAEDecode"])
+
+    assert info == {"KSampler": {"input": {}}, "VAEDecode": {"input": {}}}
+    urls = sorted(c.args[0] for c in mock_get.call_args_list)
+    assert urls == [
+        "http://localhost:8188/object_info/KSampler",
+        "http://localhost:8188/object_info/VAEDecode",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_submit_workflow_async_success():
+    client = ComfyClient("http://localhost:8188")
+    workflow = {"3": {"inputs": {"seed": 5}}}
+
+    with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+        mock_post.return_value = Mock(status_code=200)
+        mock_post.return_value.json.return_value = {"prompt_id": "12345"}
+
+        prompt_id = await client.submit_workflow_async(workflow, "test-client-id")
+
+        assert prompt_id == "12345"
+        mock_post.assert_called_once_with(
+            "/prompt",
+            json={"prompt": workflow, "client_id": "test-client-id"},
+            timeout=10,
+        )
+
+
+@pytest.mark.asyncio
+async def test_submit_workflow_async_failure():
+    client = ComfyClient("http://localhost:8188")
+
+    with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+        mock_post.return_value = Mock(status_code=400)
+        mock_post.return_value.json.return_value = {"error": "Invalid workflow"}
+        mock_post.return_value.raise_for_status.side_effect = httpx.HTTPStatusError(
+            "bad request", request=Mock(), response=Mock()
+        )
+
+        with pytest.raises(Exception) as excinfo:
+            await client.submit_workflow_async({}, "test-client-id")
+
+        assert "ComfyUI Error (400)" in str(excinfo.value)
+        assert "Invalid workflow" in str(excinfo.value)
+
+
+@pytest.mark.asyncio
+async def test_async_http_pool_is_reused():
+    client = ComfyClient("http://localhost:8188")
+    first = client._async_http()
+    assert client._async_http() is first
+    await client.aclose()
+    assert client._http is None
@@ -0,0 +1,75 @@
+import pytest
+from comfy_pool import ComfyPool
+from unittest.mock import AsyncMock, MagicMock
+
+
+def make_pool(loads, weights=None):
+    weights = weights or [1] * len(loads)
+    pool = ComfyPool([{"url": f"http://gpu{i}:8188", "weight": w} for i, w in enumerate(weights)])
+    for client, load in zip(pool.clients, loads):
+        client.get_queue_load_async = AsyncMock(return_value=load)
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_pick_least_loaded_backend():
+    pool = make_pool([3, 1, 2])
+    assert await pool.pick_backend() is pool.clients[1]
+
+
+@pytest.mark.asyncio
+async def test_pick_respects_weights():
+    # gpu0 has twice the capacity, so 3 queued there beats 2 on gpu1
+    pool = make_pool([3, 2], weights=[2, 1])
+    assert await pool.pick_backend() is pool.clients[0]
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_backend_skipped_until_cooldown():
+    pool = make_pool([None, 5])
+    assert await pool.pick_backend() is pool.clients[1]
+
+    # The dead backend is not polled again during its cooldown
+    pool.clients[0].get_queue_load_async.reset_mock()
+    await pool.pick_backend()
+    pool.clients[0].get_queue_load_async.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_no_healthy_backend_raises():
+    pool = make_pool([None, None])
+    with pytest.raises(ConnectionError):
+        await pool.pick_backend()
+
+
+@pytest.mark.asyncio
+async def test_prompts_routed_to_owning_backend():
+    pool = make_pool([0, 4])
+    pool.clients[0].queue_prompt = AsyncMock(return_value="p1")
+
+    async def mock_stream(prompt_id):
+        yield {"type": "image", "data": prompt_id.encode()}
+
+    pool.clients[0].stream_prompt = MagicMock(side_effect=mock_stream)
+    pool.clients[1].stream_prompt = MagicMock()
+
+    events = [event async for event in pool.generate_image({"1": {}})]
+
+    assert events == [{"type": "queued", "prompt_id": "p1"}, {"type": "image", "data": b"p1"}]
+    pool.clients[0].queue_prompt.assert_awaited_once_with({"1": {}})
+    pool.clients[1].stream_prompt.assert_not_called()
+    # Ownership is forgotten once the prompt has finished
+    assert pool.owner_of("p1") is None
+
+
+@pytest.mark.asyncio
+async def test_delete_queued_grouped_by_backend():
+    pool = make_pool([0, 0])
+    pool._owners = {"a": pool.clients[0], "b": pool.clients[1], "c": pool.clients[0]}
+    for client in pool.clients:
+        client.delete_queued = AsyncMock()
+
+    await pool.delete_queued(["a", "b", "c"])
+
+    pool.clients[0].delete_queued.assert_awaited_once_with(["a", "c"])
+    pool.clients[1].delete_queued.assert_awaited_once_with(["b"])
@@ -1,25 +1,35 @@
 import pytest
 import json
+import asyncio
 from comfy_client import ComfyClient
 from unittest.mock import patch, Mock, AsyncMock
 
 
-@pytest.mark.asyncio
-async def test_generate_image_success():
+def executing(prompt_id, node):
+    return json.dumps({"type": "executing", "data": {"node": node, "prompt_id": prompt_id}})
 
-    client = ComfyClient("http://localhost:8188")
 
-    # client.client_id is gone
+def scripted_ws(messages):
+    """Builds a mock websocket that replays messages, then idles until closed."""
+    mock_ws = AsyncMock()
+    pending = list(messages)
 
-    prompt_id = "test-prompt-id"
+    async def recv():
+        if pending:
+            return pending.pop(0)
+        await asyncio.sleep(3600)
 
-    workflow = {"test": "workflow"}
+    mock_ws.recv.side_effect = recv
+    return mock_ws
 
-    # Mock WebSocket connection and messages
 
-    mock_ws = AsyncMock()
+@pytest.mark.asyncio
+async def test_generate_image_success():
+    with patch("uuid.uuid4", return_value="dynamic-client-id"):
+        client = ComfyClient("http://localhost:8188")
 
-    mock_ws.__aenter__.return_value = mock_ws
+    prompt_id = "test-prompt-id"
+    workflow = {"test": "workflow"}
 
     messages = [
         json.dumps({"type": "status", "data": {"status": {}}}),
@@ -46,110 +56,189 @@ async def test_generate_image_success():
                 },
             }
         ),
+        executing(prompt_id, None),
     ]
-
-    mock_ws.recv.side_effect = messages
-
-    # Mock image download and submit_workflow
-
+    mock_ws = scripted_ws(messages)
     image_bytes = b"fake_image_data"
 
-    with patch("uuid.uuid4", return_value="dynamic-client-id"):
+    with patch("websockets.connect", AsyncMock(return_value=mock_ws)) as mock_connect:
+        with patch.object(
+            client, "_get_image_async", AsyncMock(return_value=image_bytes)
+        ) as mock_get:
+            with patch.object(
+                client, "submit_workflow_async", AsyncMock(return_value=prompt_id)
+            ) as mock_post:
+                events = []
+                async for event in client.generate_image(workflow):
+                    events.append(event)
 
-        with patch("websockets.connect", return_value=mock_ws) as mock_connect:
+                assert events == [
+                    {"type": "queued", "prompt_id": prompt_id},
+                    {"type": "progress", "value": 1, "max": 10},
+                    {"type": "image", "data": image_bytes},
+                ]
 
-            with patch("requests.get") as mock_get:
+                # The process-wide client id is used for both the socket and the prompt
+                mock_connect.assert_called_once_with(
+                    "ws://localhost:8188/ws?clientId=dynamic-client-id",
+                    max_size=10485760,
+                )
+                mock_post.assert_awaited_once_with(workflow, "dynamic-client-id")
+                mock_get.assert_awaited_once_with("test_image.png", "", "output")
 
-                with patch("requests.post") as mock_post:
+    await client.aclose()
 
-                    # Mock submit_workflow response
 
-                    mock_post.return_value.status_code = 200
+@pytest.mark.asyncio
+async def test_generate_image_with_previews():
+    client = ComfyClient("http://localhost:8188")
+    prompt_id = "test-prompt-id"
 
-                    mock_post.return_value.json.return_value = {"prompt_id": prompt_id}
+    preview_bytes = b"\x00\x00\x00\x01\x00\x00\x00\x02fake_preview_data"
+    messages = [
+        json.dumps({"type": "status", "data": {"status": {}}}),
+        executing(prompt_id, "3"),
+        preview_bytes,  # Binary message
+        json.dumps(
+            {
+                "type": "executed",
+                "data": {"prompt_id": prompt_id, "output": {"images": []}},
+            }
+        ),
+        executing(prompt_id, None),
+    ]
 
-                    mock_get.return_value.content = image_bytes
+    with patch("websockets.connect", AsyncMock(return_value=scripted_ws(messages))):
+        with patch.object(client, "submit_workflow_async", AsyncMock(return_value=prompt_id)):
+            events = []
+            async for event in client.generate_image({"test": "workflow"}):
+                events.append(event)
 
-                    events = []
+            preview_event = next(e for e in events if e["type"] == "preview")
+            # We strip the 8-byte header in implementation
+            assert preview_event["data"] == preview_bytes[8:]
 
-                    async for event in client.generate_image(workflow):
+    await client.aclose()
 
-                        events.append(event)
 
-                    # Check assertions
+@pytest.mark.asyncio
+async def test_single_websocket_shared_across_prompts():
+    client = ComfyClient("http://localhost:8188")
+    gate = asyncio.Event()
+    pending = [executing("p1", None), executing("p2", None)]
 
-                    assert len(events) == 2
+    async def recv():
+        await gate.wait()
+        if pending:
+            return pending.pop(0)
+        await asyncio.sleep(3600)
 
-                    # Verify WS connection URL with dynamic ID
+    mock_ws = AsyncMock()
+    mock_ws.recv.side_effect = recv
 
-                    mock_connect.assert_called_once_with(
-                        "ws://localhost:8188/ws?clientId=dynamic-client-id",
-                        max_size=10485760,
-                    )
+    with patch("websockets.connect", AsyncMock(return_value=mock_ws)) as mock_connect:
+        with patch.object(client, "submit_workflow_async", AsyncMock(side_effect=["p1", "p2"])):
 
-                    # Verify workflow submission uses dynamic ID
+            async def run():
+                return [event async for event in client.generate_image({})]
 
-                    # We can check call args
+            first = asyncio.create_task(run())
+            second = asyncio.create_task(run())
+            await asyncio.sleep(0)
+            gate.set()
+            results = await asyncio.wait_for(asyncio.gather(first, second), 1)
+            assert [[e["prompt_id"] for e in events] for events in results] == [["p1"], ["p2"]]
 
-                    call_args = mock_post.call_args
+            mock_connect.assert_called_once()
 
-                    assert call_args[1]["json"]["client_id"] == "dynamic-client-id"
+    await client.aclose()
 
 
 @pytest.mark.asyncio
-async def test_generate_image_with_previews():
-
+async def test_frames_routed_by_prompt_id():
     client = ComfyClient("http://localhost:8188")
+    preview = b"\x00\x00\x00\x01\x00\x00\x00\x02frame"
+    messages = [
+        # An unrelated prompt's frames must not leak into ours
+        json.dumps({"type": "progress", "data": {"prompt_id": "other", "value": 9, "max": 9}}),
+        executing("other", "5"),
+        preview,
+        executing("other", None),
+        executing("mine", "3"),
+        json.dumps({"type": "progress", "data": {"prompt_id": "mine", "value": 1, "max": 2}}),
+        executing("mine", None),
+    ]
 
-    # client.client_id is gone
-
-    prompt_id = "test-prompt-id"
-
-    workflow = {"test": "workflow"}
-
-    # Mock WebSocket connection and messages
-
-    mock_ws = AsyncMock()
-
-    mock_ws.__aenter__.return_value = mock_ws
-
-    preview_bytes = b"\x00\x00\x00\x01\x00\x00\x00\x02fake_preview_data"
+    with patch("websockets.connect", AsyncMock(return_value=scripted_ws(messages))):
+        with patch.object(client, "submit_workflow_async", AsyncMock(return_value="mine")):
+            events = [event async for event in client.generate_image({})]
 
-    messages = [
-        json.dumps({"type": "status", "data": {"status": {}}}),
-        preview_bytes,  # Binary message
-        json.dumps(
-            {
-                "type": "executed",
-                "data": {"prompt_id": prompt_id, "output": {"images": []}},
-            }
-        ),
+    assert events == [
+        {"type": "queued", "prompt_id": "mine"},
+        {"type": "progress", "value": 1, "max": 2},
     ]
+    # Unclaimed frames for the other prompt stay queued for its own consumer
+    assert "other" in client._prompt_queues
+    await client.aclose()
 
-    mock_ws.recv.side_effect = messages
 
-    with patch("uuid.uuid4", return_value="dynamic-client-id"):
+@pytest.mark.asyncio
+async def test_connection_loss_fails_waiting_prompt():
+    client = ComfyClient("http://localhost:8188")
+    mock_ws = AsyncMock()
+    mock_ws.recv.side_effect = [executing("p1", "3"), ConnectionResetError("gone")]
 
-        with patch("websockets.connect", return_value=mock_ws):
+    with patch("websockets.connect", AsyncMock(return_value=mock_ws)):
+        with patch.object(client, "submit_workflow_async", AsyncMock(return_value="p1")):
+            with pytest.raises(ConnectionError):
+                async for _ in client.generate_image({}):
+                    pass
 
-            with patch("requests.post") as mock_post:
+    assert client._ws is None
 
-                mock_post.return_value.status_code = 200
 
-                mock_post.return_value.json.return_value = {"prompt_id": prompt_id}
+@pytest.mark.asyncio
+async def test_cancel_prompts_only_touches_own_prompts():
+    client = ComfyClient("http://localhost:8188")
+    queue = {
+        "queue_running": [[1, "mine-running", {}, {}, []]],
+        "queue_pending": [[2, "mine-queued", {}, {}, []], [3, "someone-else", {}, {}, []]],
+    }
 
-                events = []
+    with patch.object(client, "_get_queue_async", AsyncMock(return_value=queue)):
+        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
+            await client.cancel_prompts(["mine-running", "mine-queued"])
 
-                async for event in client.generate_image(workflow):
+    posted = [(c.args[0], c.kwargs["json"]) for c in mock_post.call_args_list]
+    assert ("/queue", {"delete": ["mine-queued"]}) in posted
+    assert ("/interrupt", {"prompt_id": "mine-running"}) in posted
+    assert len(posted) == 2
 
-                    events.append(event)
 
-                # Check for preview event
+@pytest.mark.asyncio
+async def test_deleted_prompts_are_forgotten():
+    client = ComfyClient("http://localhost:8188")
 
-                assert any(e["type"] == "preview" for e in events)
+    with patch("httpx.AsyncClient.post", new_callable=AsyncMock):
+        await client.delete_queued(["p1", "p2"])
 
-                preview_event = next(e for e in events if e["type"] == "preview")
+    assert client._closed_prompts == set()
+    assert client._prompt_queues == {}
+    await client.aclose()
 
-                # We strip the 8-byte header in implementation
 
-                assert preview_event["data"] == preview_bytes[8:]
+@pytest.mark.asyncio
+async def test_only_newest_preview_waits_for_unstreamed_prompt():
+    client = ComfyClient("http://localhost:8188")
+    frames = [b"\x00\x00\x00\x01\x00\x00\x00\x02" + bytes([n]) for n in range(3)]
+    messages = [executing("p1", "3"), *frames, executing("p1", None)]
+
+    with patch("websockets.connect", AsyncMock(return_value=scripted_ws(messages))):
+        with patch.object(client, "submit_workflow_async", AsyncMock(return_value="p1")):
+            await client.queue_prompt({})
+            for _ in range(10):
+                await asyncio.sleep(0)
+            events = [event async for event in client.stream_prompt("p1")]
+
+    assert [bytes(event["data"]) for event in events] == [b"\x02"]
+    await client.aclose()
@@ -54,3 +54,137 @@ def test_slider_config_overrides(tmp_path):
 
     # Check new
     assert manager.sliders["custom_param"]["max"] == 10
+
+
+def test_pipeline_depth(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost"}))
+    assert ConfigManager(str(config_file)).pipeline_depth == 2
+
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost", "pipeline_depth": 0}))
+    # Anything below 1 falls back to strictly sequential batches
+    assert ConfigManager(str(config_file)).pipeline_depth == 1
+
+
+def test_backends_default_to_comfy_url(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://gpu0:8188"}))
+
+    manager = ConfigManager(str(config_file))
+    assert manager.backends == [{"url": "http://gpu0:8188", "weight": 1}]
+
+
+def test_backends_list_with_weights(tmp_path):
+    config_data = {
+        "backends": ["http://gpu0:8188", {"url": "http://gpu1:8188", "weight": 2}],
+    }
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps(config_data))
+
+    manager = ConfigManager(str(config_file))
+    assert manager.backends == [
+        {"url": "http://gpu0:8188", "weight": 1},
+        {"url": "http://gpu1:8188", "weight": 2},
+    ]
+    # Single-backend code paths keep working off the first entry
+    assert manager.comfy_url == "http://gpu0:8188"
+
+
+def test_backend_weight_must_be_positive(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"backends": [{"url": "http://gpu0", "weight": 0}]}))
+
+    with pytest.raises(ValueError):
+        ConfigManager(str(config_file))
+
+
+def test_batch_distribution_options(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"distribute_batches": True, "batch_order": "completion"}))
+
+    manager = ConfigManager(str(config_file))
+    assert manager.distribute_batches is True
+    assert manager.batch_order == "completion"
+
+    config_file.write_text(json.dumps({"batch_order": "random"}))
+    with pytest.raises(ValueError):
+        ConfigManager(str(config_file))
+
+
+def test_scheduler_limits(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost"}))
+    manager = ConfigManager(str(config_file))
+    assert (manager.max_in_flight, manager.max_bulk_in_flight) == (3, 2)
+    assert manager.concurrency_limit is None
+
+    config_file.write_text(json.dumps({"max_in_flight": 4, "max_bulk_in_flight": 0}))
+    manager = ConfigManager(str(config_file))
+    assert (manager.max_in_flight, manager.max_bulk_in_flight) == (4, 1)
+
+
+def test_max_progress_hz(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost"}))
+    assert ConfigManager(str(config_file)).max_progress_hz == 10
+
+    config_file.write_text(json.dumps({"max_progress_hz": 2.5}))
+    assert ConfigManager(str(config_file)).max_progress_hz == 2.5
+
+
+def test_history_limit(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost"}))
+    assert ConfigManager(str(config_file)).history_limit == 500
+
+    config_file.write_text(json.dumps({"history_limit": -1}))
+    assert ConfigManager(str(config_file)).history_limit == 0
+
+
+def test_image_memory_budget(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost"}))
+    assert ConfigManager(str(config_file)).image_memory_mb == 512
+
+    config_file.write_text(json.dumps({"image_memory_mb": 64}))
+    assert ConfigManager(str(config_file)).image_memory_mb == 64
+
+
+def test_output_cache_budget(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost"}))
+    assert ConfigManager(str(config_file)).output_cache_mb == 2048
+
+    config_file.write_text(json.dumps({"output_cache_mb": 0}))
+    assert ConfigManager(str(config_file)).output_cache_mb == 1
+
+
+def test_preview_max_age(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost"}))
+    assert ConfigManager(str(config_file)).preview_max_age == 300
+
+    config_file.write_text(json.dumps({"preview_max_age": 30}))
+    assert ConfigManager(str(config_file)).preview_max_age == 30
+
+
+def test_archive_dir(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost"}))
+    assert ConfigManager(str(config_file)).archive_dir == "outputs"
+
+    config_file.write_text(json.dumps({"archive_dir": None}))
+    assert ConfigManager(str(config_file)).archive_dir is None
+
+
+def test_history_db(tmp_path):
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"comfy_url": "http://localhost"}))
+    assert ConfigManager(str(config_file)).history_db == "history.sqlite3"
+
+    assert ConfigManager(str(config_file)).shared_history is False
+
+    config_file.write_text(json.dumps({"history_db": None, "shared_history": True}))
+    manager = ConfigManager(str(config_file))
+    assert manager.history_db is None
+    assert manager.shared_history is True
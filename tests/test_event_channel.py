@@ -0,0 +1,174 @@
+import pytest
+import asyncio
+import threading
+from event_channel import LatestWinsChannel, coalesce_events
+from image_memory import ImageMemory
+
+
+def preview(n):
+    return {"type": "preview", "data": bytes([n])}
+
+
+def progress(n):
+    return {"type": "progress", "value": n, "max": 10}
+
+
+async def drain(channel):
+    events = []
+    while (event := await channel.get()) is not None:
+        events.append(event)
+    return events
+
+
+@pytest.mark.asyncio
+async def test_newer_previews_replace_pending_ones():
+    channel = LatestWinsChannel(max_progress_hz=0)
+    await channel.put({"type": "queued", "prompt_id": "p1"})
+    for n in range(5):
+        await channel.put(preview(n))
+    channel.close()
+
+    assert await drain(channel) == [{"type": "queued", "prompt_id": "p1"}, preview(4)]
+    assert channel.dropped == 4
+
+
+@pytest.mark.asyncio
+async def test_image_replaces_pending_preview_and_progress():
+    channel = LatestWinsChannel(max_progress_hz=0)
+    await channel.put(progress(9))
+    await channel.put(preview(1))
+    await channel.put({"type": "image", "data": b"final"})
+    await channel.put(progress(1))
+    channel.close()
+
+    assert await drain(channel) == [{"type": "image", "data": b"final"}, progress(1)]
+
+
+@pytest.mark.asyncio
+async def test_progress_rate_limited_to_latest():
+    channel = LatestWinsChannel(max_progress_hz=20)
+    await channel.put(progress(1))
+    assert await channel.get() == progress(1)
+
+    # Held back until the interval passes, replaced by newer updates meanwhile
+    await channel.put(progress(2))
+    await channel.put(progress(3))
+    await channel.put(preview(1))
+    assert await channel.get() == preview(1)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert await channel.get() == progress(3)
+    assert loop.time() - started > 0.01
+
+
+@pytest.mark.asyncio
+async def test_reader_waits_when_kept_events_fill_the_channel():
+    channel = LatestWinsChannel(size=1)
+    await channel.put({"type": "image", "data": b"1"})
+    put = asyncio.create_task(channel.put({"type": "image", "data": b"2"}))
+    await asyncio.sleep(0)
+    assert not put.done()
+
+    assert await channel.get() == {"type": "image", "data": b"1"}
+    await put
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_skips_stale_previews():
+    async def events():
+        for n in range(50):
+            yield preview(n)
+            await asyncio.sleep(0)
+        yield {"type": "image", "data": b"final"}
+
+    seen = []
+    async for event in coalesce_events(events(), max_progress_hz=0):
+        seen.append(event)
+        await asyncio.sleep(0.005)
+
+    assert len(seen) < 10
+    assert seen[-1] == {"type": "image", "data": b"final"}
+
+
+@pytest.mark.asyncio
+async def test_reader_error_reaches_consumer_and_stream_is_closed():
+    closed = asyncio.Event()
+
+    async def events():
+        try:
+            yield preview(1)
+            raise RuntimeError("socket gone")
+        finally:
+            closed.set()
+
+    seen = []
+    with pytest.raises(RuntimeError, match="socket gone"):
+        async for event in coalesce_events(events()):
+            seen.append(event)
+
+    assert seen == [preview(1)]
+    assert closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_stopping_early_closes_the_stream():
+    closed = asyncio.Event()
+
+    async def events():
+        try:
+            while True:
+                yield preview(1)
+                await asyncio.sleep(0.001)
+        finally:
+            closed.set()
+
+    stream = coalesce_events(events())
+    assert await stream.__anext__() == preview(1)
+    await stream.aclose()
+
+    assert closed.is_set()
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_drops_previews_and_spills_images():
+    spilled = []
+    spill_threads = []
+
+    def spill(data):
+        spilled.append(bytes(data))
+        spill_threads.append(threading.current_thread())
+        return "/outputs/final.png"
+
+    memory = ImageMemory(10, spill=spill)
+    channel = LatestWinsChannel(max_progress_hz=0, memory=memory)
+    await channel.put({"type": "image", "data": b"12345678"})
+    await channel.put({"type": "preview", "data": b"abcd"})
+    assert memory.usage()["used_bytes"] == 4
+    while not spilled:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.01)
+
+    # The older image went to disk to make room for the preview, written off the loop
+    assert spilled == [b"12345678"]
+    assert spill_threads != [threading.current_thread()]
+
+    await channel.put({"type": "preview", "data": b"0123456789ab"})
+    channel.close()
+
+    assert await drain(channel) == [{"type": "image", "path": "/outputs/final.png"}]
+    assert memory.usage()["used_bytes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_released_when_events_are_taken():
+    memory = ImageMemory(100)
+    events = [preview(1), {"type": "image", "data": b"final"}]
+
+    async def source():
+        for event in events:
+            yield event
+
+    seen = [event async for event in coalesce_events(source(), memory=memory)]
+
+    assert seen[-1] == {"type": "image", "data": b"final"}
+    assert memory.usage()["used_bytes"] == 0
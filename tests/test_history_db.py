@@ -0,0 +1,89 @@
+from history_db import HistoryDB
+
+
+def add_images(db, count, **fields):
+    for i in range(count):
+        db.add([(f"outputs/{i}.png", f"cache/{i}.png")], created=1000.0 + i, **fields)
+
+
+def test_rows_round_trip(tmp_path):
+    db = HistoryDB(str(tmp_path / "history.sqlite3"))
+    db.add(
+        [("outputs/a.png", "cache/a.png")],
+        created=1000.0,
+        owner="alice",
+        workflow_name="SDXL",
+        prompt="a cat",
+        seeds={"3.seed": 42},
+        overrides={"3.cfg": "7"},
+        backend="http://gpu1:8188",
+        duration=2.5,
+    )
+
+    rows, cursor = db.page()
+
+    assert cursor is None
+    assert len(rows) == 1
+    row = rows[0]
+    assert row["path"] == "outputs/a.png"
+    assert row["source"] == "cache/a.png"
+    assert row["prompt"] == "a cat"
+    assert row["seeds"] == {"3.seed": 42}
+    assert row["overrides"] == {"3.cfg": "7"}
+    assert row["backend"] == "http://gpu1:8188"
+    assert row["duration"] == 2.5
+    db.close()
+
+
+def test_pages_follow_cursor_newest_first(tmp_path):
+    db = HistoryDB(str(tmp_path / "history.sqlite3"))
+    add_images(db, 5)
+    # Same timestamp: the id keeps the order stable
+    db.add([("outputs/x.png", None), ("outputs/y.png", None)], created=1004.0)
+
+    paths = []
+    cursor = None
+    while True:
+        rows, cursor = db.page(cursor=cursor, limit=2)
+        paths.extend(row["path"] for row in rows)
+        if cursor is None:
+            break
+
+    assert paths == ["outputs/y.png", "outputs/x.png"] + [
+        f"outputs/{i}.png" for i in range(4, -1, -1)
+    ]
+    db.close()
+
+
+def test_pages_filtered_by_owner_and_workflow(tmp_path):
+    db = HistoryDB(str(tmp_path / "history.sqlite3"))
+    add_images(db, 3, owner="alice", workflow_name="SDXL")
+    add_images(db, 2, owner="bob", workflow_name="Flux")
+
+    assert len(db.page(owner="alice")[0]) == 3
+    assert len(db.page(workflow_name="Flux")[0]) == 2
+    assert db.page(owner="alice", workflow_name="Flux")[0] == []
+    db.close()
+
+
+def test_history_survives_reopening(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    db = HistoryDB(path)
+    add_images(db, 2)
+    db.close()
+
+    db = HistoryDB(path)
+    assert len(db.page()[0]) == 2
+    db.close()
+
+
+def test_filtered_pages_use_an_index(tmp_path):
+    db = HistoryDB(str(tmp_path / "history.sqlite3"))
+    plan = db._conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM images WHERE owner = ? AND (created, id) < (?, ?)"
+        " ORDER BY created DESC, id DESC LIMIT 61",
+        ("alice", 1000.0, 1),
+    ).fetchall()
+
+    assert "images_by_owner" in " ".join(row[-1] for row in plan)
+    db.close()
@@ -0,0 +1,24 @@
+from image_memory import ImageMemory
+
+
+def test_usage_tracks_held_and_released_bytes():
+    memory = ImageMemory(100)
+    first = memory.hold(30, lambda: None)
+    memory.hold(20, lambda: None)
+    assert memory.usage() == {"used_bytes": 50, "budget_bytes": 100, "entries": 2, "evicted": 0}
+
+    memory.release(first)
+    memory.release(first)
+    assert memory.usage()["used_bytes"] == 20
+
+
+def test_oldest_entries_evicted_past_budget():
+    memory = ImageMemory(100)
+    evicted = []
+    memory.hold(60, lambda: evicted.append("a"))
+    memory.hold(30, lambda: evicted.append("b"))
+    memory.hold(40, lambda: evicted.append("c"))
+
+    assert evicted == ["a"]
+    assert memory.usage()["used_bytes"] == 70
+    assert memory.evicted == 1
@@ -0,0 +1,322 @@
+import pytest
+import asyncio
+from job_scheduler import BULK, JobScheduler
+from comfy_pool import ComfyPool
+from image_memory import ImageMemory
+from unittest.mock import AsyncMock, MagicMock
+
+
+def make_backend(finish_events):
+    """Mock client whose prompts finish when their asyncio.Event is set."""
+    backend = MagicMock()
+    counter = iter(range(1000))
+
+    async def queue_prompt(workflow):
+        prompt_id = f"{workflow['name']}-{next(counter)}"
+        finish_events[prompt_id] = asyncio.Event()
+        return prompt_id
+
+    async def stream_prompt(prompt_id):
+        await finish_events[prompt_id].wait()
+        yield {"type": "image", "data": prompt_id.encode()}
+
+    backend.queue_prompt = AsyncMock(side_effect=queue_prompt)
+    backend.stream_prompt = MagicMock(side_effect=stream_prompt)
+    backend.cancel_prompts = AsyncMock()
+    backend.aclose = AsyncMock()
+    return backend
+
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_in_flight_capped_per_backend():
+    finish = {}
+    backend = make_backend(finish)
+    scheduler = JobScheduler(backend, max_in_flight=2)
+    client = scheduler.for_owner("alice")
+
+    jobs = [await client.queue_prompt({"name": "a"}) for _ in range(3)]
+    await settle()
+
+    assert backend.queue_prompt.await_count == 2
+    assert scheduler.position(jobs[2]) == 1
+
+    finish["a-0"].set()
+    events = [event async for event in client.stream_prompt(jobs[0])]
+    await settle()
+
+    assert events == [{"type": "image", "data": b"a-0"}]
+    assert backend.queue_prompt.await_count == 3
+    assert scheduler.position(jobs[2]) == 0
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_round_robin_across_owners():
+    finish = {}
+    backend = make_backend(finish)
+    scheduler = JobScheduler(backend, max_in_flight=1)
+    alice = scheduler.for_owner("alice")
+    bob = scheduler.for_owner("bob")
+
+    for _ in range(3):
+        await alice.queue_prompt({"name": "alice"})
+    bob_job = await bob.queue_prompt({"name": "bob"})
+    await settle()
+
+    # Bob's single job goes next, ahead of Alice's remaining batch
+    assert scheduler.position(bob_job) == 1
+
+    finish["alice-0"].set()
+    await settle()
+    submitted = [c.args[0]["name"] for c in backend.queue_prompt.await_args_list]
+    assert submitted == ["alice", "bob"]
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_waiting_job_reports_position():
+    finish = {}
+    backend = make_backend(finish)
+    scheduler = JobScheduler(backend, max_in_flight=1)
+    client = scheduler.for_owner("alice")
+
+    await client.queue_prompt({"name": "a"})
+    await settle()
+
+    events = []
+
+    async def consume():
+        async for event in client.generate_image({"name": "b"}):
+            events.append(event)
+
+    task = asyncio.create_task(consume())
+    await settle()
+    assert events[1] == {"type": "waiting", "position": 1}
+
+    finish["a-0"].set()
+    await settle()
+    finish["b-1"].set()
+    await asyncio.wait_for(task, 1)
+    assert events[-1] == {"type": "image", "data": b"b-1"}
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancel_waiting_job_never_reaches_comfy():
+    finish = {}
+    backend = make_backend(finish)
+    scheduler = JobScheduler(backend, max_in_flight=1)
+    client = scheduler.for_owner("alice")
+
+    running = await client.queue_prompt({"name": "a"})
+    waiting = await client.queue_prompt({"name": "a"})
+    await settle()
+
+    await client.cancel_prompts([running, waiting])
+    await settle()
+
+    backend.cancel_prompts.assert_awaited_once_with(["a-0"])
+    assert backend.queue_prompt.await_count == 1
+    assert scheduler.waiting_count() == 0
+    assert scheduler.in_flight() == {backend: 0}
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_pool_backends_filled_by_capacity():
+    pool = ComfyPool([{"url": f"http://gpu{i}:8188", "weight": 1} for i in range(2)])
+    finish = {}
+    for client in pool.clients:
+        backend = make_backend(finish)
+        client.queue_prompt = backend.queue_prompt
+        client.stream_prompt = backend.stream_prompt
+        client.get_queue_load_async = AsyncMock(return_value=0)
+        client.aclose = AsyncMock()
+    scheduler = JobScheduler(pool, max_in_flight=1)
+    client = scheduler.for_owner("alice")
+
+    for _ in range(3):
+        await client.queue_prompt({"name": "a"})
+    await settle()
+
+    assert list(scheduler.in_flight().values()) == [1, 1]
+    assert scheduler.waiting_count() == 1
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_bulk_held_back_for_interactive():
+    finish = {}
+    backend = make_backend(finish)
+    scheduler = JobScheduler(backend, max_in_flight=2, max_bulk_in_flight=1)
+    batch = scheduler.for_owner("alice", BULK)
+    single = scheduler.for_owner("bob")
+
+    for _ in range(3):
+        await batch.queue_prompt({"name": "bulk"})
+    await settle()
+    # Only one bulk prompt reaches ComfyUI; the second slot stays free
+    assert backend.queue_prompt.await_count == 1
+
+    await single.queue_prompt({"name": "single"})
+    await settle()
+    assert backend.queue_prompt.await_count == 2
+    assert scheduler.waiting_count(BULK) == 2
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_interactive_overtakes_waiting_bulk():
+    finish = {}
+    backend = make_backend(finish)
+    scheduler = JobScheduler(backend, max_in_flight=1, max_bulk_in_flight=1)
+    batch = scheduler.for_owner("alice", BULK)
+    single = scheduler.for_owner("alice")
+
+    for _ in range(2):
+        await batch.queue_prompt({"name": "bulk"})
+    job = await single.queue_prompt({"name": "single"})
+    await settle()
+    assert scheduler.position(job) == 1
+
+    finish["bulk-0"].set()
+    await settle()
+    submitted = [c.args[0]["name"] for c in backend.queue_prompt.await_args_list]
+    assert submitted == ["bulk", "single"]
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_backend_of_remembers_placement():
+    finish = {}
+    backend = make_backend(finish)
+    backend.base_url = "http://gpu1:8188"
+    scheduler = JobScheduler(backend)
+    client = scheduler.for_owner("alice")
+
+    job = await client.queue_prompt({"name": "a"})
+    assert client.backend_of(job) is None
+    await settle()
+
+    finish["a-0"].set()
+    events = [event async for event in client.stream_prompt(job)]
+
+    assert events == [{"type": "image", "data": b"a-0"}]
+    assert client.backend_of(job) == "http://gpu1:8188"
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_job_waits_for_healthy_backend_when_another_is_down():
+    pool = ComfyPool([{"url": f"http://gpu{i}:8188", "weight": 1} for i in range(2)])
+    finish = {}
+    backend = make_backend(finish)
+    dead, healthy = pool.clients
+    dead.get_queue_load_async = AsyncMock(return_value=None)
+    healthy.get_queue_load_async = AsyncMock(return_value=0)
+    healthy.queue_prompt = backend.queue_prompt
+    healthy.stream_prompt = backend.stream_prompt
+    scheduler = JobScheduler(pool, max_in_flight=1)
+    client = scheduler.for_owner("alice")
+
+    first = await client.queue_prompt({"name": "a"})
+    second = await client.queue_prompt({"name": "a"})
+    await settle()
+    assert backend.queue_prompt.await_count == 1
+
+    finish["a-0"].set()
+    assert [event async for event in client.stream_prompt(first)][-1]["data"] == b"a-0"
+    await settle()
+    finish["a-1"].set()
+    events = [event async for event in client.stream_prompt(second)]
+
+    assert events[-1] == {"type": "image", "data": b"a-1"}
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_prompt_cancelled_while_being_submitted_is_cancelled_on_comfy():
+    finish = {}
+    backend = make_backend(finish)
+    accepted = asyncio.Event()
+
+    async def slow_queue_prompt(workflow):
+        await accepted.wait()
+        return "a-0"
+
+    backend.queue_prompt = AsyncMock(side_effect=slow_queue_prompt)
+    scheduler = JobScheduler(backend, max_in_flight=1)
+    client = scheduler.for_owner("alice")
+
+    job = await client.queue_prompt({"name": "a"})
+    await settle()
+    await client.cancel_prompts([job])
+    await settle()
+    backend.cancel_prompts.assert_not_awaited()
+
+    # ComfyUI answers the POST after all
+    accepted.set()
+    await settle()
+    backend.cancel_prompts.assert_awaited_once_with(["a-0"])
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_next_bulk_item_queued_while_one_runs():
+    finish = {}
+    backend = make_backend(finish)
+    scheduler = JobScheduler(backend)
+    batch = scheduler.for_owner("alice", BULK)
+
+    jobs = [await batch.queue_prompt({"name": "bulk"}) for _ in range(3)]
+    await settle()
+    # Item 2 is already on ComfyUI while item 1 runs
+    assert backend.queue_prompt.await_count == 2
+
+    finish["bulk-0"].set()
+    [event async for event in batch.stream_prompt(jobs[0])]
+    await settle()
+    assert backend.queue_prompt.await_count == 3
+
+    # Interactive prompts still find a free slot
+    await scheduler.for_owner("bob").queue_prompt({"name": "single"})
+    await settle()
+    assert backend.queue_prompt.await_count == 4
+    await scheduler.aclose()
+
+
+@pytest.mark.asyncio
+async def test_images_of_unread_jobs_spill_past_memory_budget():
+    backend = MagicMock()
+    backend.queue_prompt = AsyncMock(return_value="p1")
+
+    async def stream_prompt(prompt_id):
+        for n in range(3):
+            yield {"type": "preview", "data": b"p" * 40}
+        for n in range(3):
+            yield {"type": "image", "data": bytes([n]) * 40}
+
+    backend.stream_prompt = MagicMock(side_effect=stream_prompt)
+    backend.aclose = AsyncMock()
+    spilled = []
+    memory = ImageMemory(100, spill=lambda data: spilled.append(data) or f"img-{len(spilled)}")
+    scheduler = JobScheduler(backend, memory=memory)
+    client = scheduler.for_owner("alice")
+
+    job = await client.queue_prompt({"name": "a"})
+    await settle()
+    # The spill itself runs on a worker thread
+    await asyncio.sleep(0.05)
+    # Nobody streams the job yet: older previews were dropped, one image spilled
+    assert memory.used_bytes <= 100
+    assert len(spilled) == 1
+
+    events = [event async for event in client.stream_prompt(job)]
+    assert [event.get("path") for event in events] == ["img-1", None, None]
+    assert memory.used_bytes == 0
+    await scheduler.aclose()
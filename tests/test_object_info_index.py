@@ -0,0 +1,172 @@
+import time
+from object_info_index import (
+    InputSpec,
+    ObjectInfoIndex,
+    ObjectInfoSnapshot,
+    REFRESH_RETRY_INTERVAL,
+    load_object_info_index,
+)
+from unittest.mock import MagicMock, call, patch
+from ui import extract_workflow_inputs
+
+OBJECT_INFO = {
+    "KSampler": {
+        "input": {
+            "required": {
+                "sampler_name": [["euler", "ddim"]],
+                "steps": ["INT", {"default": 20, "min": 1, "max": 10000}],
+                "model": ["MODEL"],
+            },
+            "optional": {
+                "steps": [["ignored"]],
+                "denoise": ["FLOAT", {"default": 1.0, "min": 0.0, "max": 1.0, "step": 0.01}],
+            },
+        }
+    }
+}
+
+
+def test_index_specs():
+    index = ObjectInfoIndex.from_object_info(OBJECT_INFO)
+
+    assert index.get("KSampler", "sampler_name") == InputSpec(
+        "enum", ("euler", "ddim"), None, None, None, None
+    )
+    # Required inputs take precedence over optional ones
+    assert index.get("KSampler", "steps") == InputSpec("number", None, 1, 10000, None, 20)
+    assert index.get("KSampler", "denoise").step == 0.01
+    assert index.get("KSampler", "model").kind is None
+    assert index.get("Missing", "steps") is None
+
+
+def test_unusable_object_info_gives_empty_index():
+    assert len(ObjectInfoIndex.from_object_info(None)) == 0
+
+
+def test_extraction_same_from_index_and_raw():
+    workflow = {
+        "1": {
+            "class_type": "KSampler",
+            "inputs": {"sampler_name": "euler", "steps": 20, "denoise": 0.5},
+        }
+    }
+    index = ObjectInfoIndex.from_object_info(OBJECT_INFO)
+
+    assert extract_workflow_inputs(workflow, index) == extract_workflow_inputs(
+        workflow, OBJECT_INFO
+    )
+
+
+def test_startup_fetches_only_workflow_classes():
+    client = MagicMock()
+    client.get_object_info_for.side_effect = [
+        {"KSampler": OBJECT_INFO["KSampler"]},
+        {"CLIPTextEncode": {"input": {"required": {"clip": [["a", "b"]]}}}},
+    ]
+    workflows = [{"1": {"class_type": "KSampler"}, "2": {"class_type": "KSampler"}}]
+
+    index = load_object_info_index(client, workflows)
+
+    client.get_object_info_for.assert_called_once_with(["KSampler"])
+    client.get_object_info.assert_not_called()
+    assert index.get("KSampler", "steps").kind == "number"
+
+    # Classes outside the configured workflows are fetched once, on first use
+    assert index.get("CLIPTextEncode", "clip").options == ("a", "b")
+    assert index.get("CLIPTextEncode", "text") is None
+    assert client.get_object_info_for.call_args_list[1] == call(["CLIPTextEncode"])
+    assert client.get_object_info_for.call_count == 2
+
+
+def test_fetch_loads_only_missing_classes():
+    loader = MagicMock(return_value={"CLIPTextEncode": {"input": {}}, "VAEDecode": {"input": {}}})
+    index = ObjectInfoIndex.from_object_info(OBJECT_INFO, loader, ["KSampler"])
+
+    wanted = ["KSampler", "CLIPTextEncode", "VAEDecode"]
+    assert index.missing(wanted) == ["CLIPTextEncode", "VAEDecode"]
+    index.fetch(wanted)
+    index.fetch(wanted)
+
+    # All missing classes go to the loader at once, which fetches them in parallel
+    loader.assert_called_once_with(["CLIPTextEncode", "VAEDecode"])
+    assert index.missing(wanted) == []
+
+
+def test_empty_fetch_is_retried_later():
+    loader = MagicMock(return_value={})
+    index = ObjectInfoIndex(loader=loader)
+
+    with patch("object_info_index.time.monotonic", return_value=1000):
+        index.fetch(["CLIPTextEncode"])
+        # Not marked as fetched, but not hammered either while ComfyUI is away
+        assert index.missing(["CLIPTextEncode"]) == []
+        assert index.get("CLIPTextEncode", "text") is None
+    loader.assert_called_once_with(["CLIPTextEncode"])
+
+    loader.return_value = {"CLIPTextEncode": {"input": {"required": {"text": [["a"]]}}}}
+    with patch("object_info_index.time.monotonic", return_value=1000 + REFRESH_RETRY_INTERVAL):
+        assert index.missing(["CLIPTextEncode"]) == ["CLIPTextEncode"]
+        assert index.get("CLIPTextEncode", "text").options == ("a",)
+
+
+def test_startup_falls_back_to_full_listing():
+    client = MagicMock()
+    client.get_object_info_for.return_value = {}
+    client.get_object_info.return_value = OBJECT_INFO
+
+    index = load_object_info_index(client, [{"1": {"class_type": "KSampler"}}])
+
+    assert index.get("KSampler", "sampler_name").kind == "enum"
+    assert index.get("Unknown", "x") is None
+    client.get_node_info.assert_not_called()
+
+
+def wait_for_version(index, version, timeout=2):
+    deadline = time.monotonic() + timeout
+    while index.version < version and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return index.version >= version
+
+
+def test_first_fetch_saves_snapshot(tmp_path):
+    client = MagicMock()
+    client.get_object_info_for.return_value = {"KSampler": OBJECT_INFO["KSampler"]}
+    snapshot = ObjectInfoSnapshot(str(tmp_path), "http://gpu0:8188")
+
+    load_object_info_index(client, [{"1": {"class_type": "KSampler"}}], snapshot)
+
+    assert snapshot.load() == {"KSampler": OBJECT_INFO["KSampler"]}
+
+
+def test_snapshot_served_then_refreshed_in_background(tmp_path):
+    snapshot = ObjectInfoSnapshot(str(tmp_path), "http://gpu0:8188")
+    snapshot.save({"CheckpointLoaderSimple": {"input": {"required": {"ckpt": [["old.ckpt"]]}}}})
+    client = MagicMock()
+    client.get_object_info_for.return_value = {
+        "CheckpointLoaderSimple": {"input": {"required": {"ckpt": [["old.ckpt", "new.ckpt"]]}}}
+    }
+
+    index = load_object_info_index(
+        client, [{"1": {"class_type": "CheckpointLoaderSimple"}}], snapshot
+    )
+
+    # Served from disk before ComfyUI answered, then updated in place
+    assert index.version >= 1
+    assert wait_for_version(index, 2)
+    assert index.get("CheckpointLoaderSimple", "ckpt").options == ("old.ckpt", "new.ckpt")
+
+
+def test_refreshed_again_after_first_success():
+    client = MagicMock()
+    client.get_object_info_for.side_effect = [
+        {"CheckpointLoaderSimple": {"input": {"required": {"ckpt": [["old.ckpt"]]}}}},
+        {"CheckpointLoaderSimple": {"input": {"required": {"ckpt": [["old.ckpt", "new.ckpt"]]}}}},
+    ] + [{}] * 1000
+
+    with patch("object_info_index.REFRESH_INTERVAL", 0.01):
+        index = load_object_info_index(client, [{"1": {"class_type": "CheckpointLoaderSimple"}}])
+        assert index.get("CheckpointLoaderSimple", "ckpt").options == ("old.ckpt",)
+
+        # A checkpoint added to ComfyUI later shows up without a restart
+        assert wait_for_version(index, 2)
+    assert index.get("CheckpointLoaderSimple", "ckpt").options == ("old.ckpt", "new.ckpt")
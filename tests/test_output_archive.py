@@ -0,0 +1,59 @@
+import io
+import json
+import os
+import pytest
+from PIL import Image
+from output_archive import METADATA_KEY, OutputArchive, png_with_text
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color="blue").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_text_chunk_added_without_touching_pixels():
+    png = png_bytes()
+    tagged = png_with_text(png, METADATA_KEY, json.dumps({"prompt": "a café"}))
+
+    with Image.open(io.BytesIO(tagged)) as image:
+        assert json.loads(image.text[METADATA_KEY]) == {"prompt": "a café"}
+        assert image.getpixel((0, 0)) == (0, 0, 255)
+
+
+def test_text_chunk_needs_a_png():
+    with pytest.raises(ValueError):
+        png_with_text(b"\xff\xd8\xff\xe0jpeg", METADATA_KEY, "{}")
+
+
+def test_saved_images_written_in_background(tmp_path):
+    source = tmp_path / "abcdef0123456789.png"
+    source.write_bytes(png_bytes())
+    jpeg = tmp_path / "fedcba.jpg"
+    jpeg.write_bytes(b"\xff\xd8\xff\xe0jpeg")
+    archive = OutputArchive(str(tmp_path / "archive"))
+
+    archive.save(str(source), {"prompt": "cat", "seeds": {"3.seed": 7}})
+    archive.save(str(jpeg), {"prompt": "dog"})
+    archive.close()
+
+    assert archive.stats() == {"pending": 0, "written": 2, "failed": 0}
+    files = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(tmp_path / "archive")
+        for name in names
+    )
+    png_copy = next(path for path in files if path.endswith(".png"))
+    with Image.open(png_copy) as image:
+        assert json.loads(image.text[METADATA_KEY])["seeds"] == {"3.seed": 7}
+    sidecar = next(path for path in files if path.endswith(".json"))
+    with open(sidecar) as f:
+        assert json.load(f) == {"prompt": "dog"}
+
+
+def test_missing_source_counted_as_failed(tmp_path):
+    archive = OutputArchive(str(tmp_path / "archive"))
+    archive.save(str(tmp_path / "gone.png"), {})
+    archive.close()
+
+    assert archive.stats() == {"pending": 0, "written": 0, "failed": 1}
@@ -0,0 +1,77 @@
+import os
+from output_store import OutputStore
+
+PNG = b"\x89PNG\r\n\x1a\nimage"
+
+
+def test_image_written_once_by_content(tmp_path):
+    store = OutputStore(str(tmp_path))
+
+    path = store.write(memoryview(b"\x00" * 8 + PNG)[8:])
+
+    assert path.endswith(".png")
+    assert os.path.dirname(os.path.dirname(path)) == str(tmp_path)
+    with open(path, "rb") as f:
+        assert f.read() == PNG
+    mtime = os.stat(path).st_mtime_ns
+    assert store.write(PNG) == path
+    assert os.stat(path).st_mtime_ns == mtime
+
+
+def test_different_images_get_different_paths(tmp_path):
+    store = OutputStore(str(tmp_path))
+    assert store.write(PNG + b"1") != store.write(PNG + b"2")
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_oldest_images_deleted_past_budget(tmp_path):
+    evicted = []
+    store = OutputStore(str(tmp_path), max_bytes=2 * len(PNG + b"1"), on_evict=evicted.append)
+    first = store.write(PNG + b"1")
+    second = store.write(PNG + b"2")
+    # Written again, so the first one is now the newest
+    store.write(PNG + b"1")
+    third = store.write(PNG + b"3")
+
+    assert evicted == [second]
+    assert not os.path.exists(second)
+    assert os.path.exists(first) and os.path.exists(third)
+
+
+def test_retained_images_outlive_the_budget(tmp_path):
+    store = OutputStore(str(tmp_path), max_bytes=len(PNG + b"1"))
+    shared = store.write(PNG + b"1")
+    store.retain("first session", [shared])
+    store.retain("second session", [shared])
+
+    store.write(PNG + b"2")
+    store.retain("first session", ())
+    store.write(PNG + b"3")
+    # Still retained by the second session
+    assert os.path.exists(shared)
+
+    store.retain("second session", ())
+    store.write(PNG + b"4")
+    assert not os.path.exists(shared)
+
+
+def test_files_from_earlier_runs_count_against_budget(tmp_path):
+    old = OutputStore(str(tmp_path)).write(PNG + b"old")
+    store = OutputStore(str(tmp_path), max_bytes=len(PNG + b"new"))
+
+    store.write(PNG + b"new")
+
+    assert not os.path.exists(old)
+    assert store.used_bytes == len(PNG + b"new")
+
+
+def test_adopted_file_copied_into_store(tmp_path):
+    source = tmp_path / "preview.png"
+    source.write_bytes(PNG)
+    store = OutputStore(str(tmp_path / "outputs"))
+
+    path = store.adopt(str(source))
+
+    assert path == store.path_for(PNG)
+    with open(path, "rb") as f:
+        assert f.read() == PNG
@@ -0,0 +1,43 @@
+import os
+from unittest.mock import patch
+from preview_store import PreviewStore, image_extension
+
+PNG = b"\x89PNG\r\n\x1a\nrest"
+JPEG = b"\xff\xd8\xff\xe0rest"
+
+
+def test_extension_from_signature():
+    assert image_extension(PNG) == ".png"
+    assert image_extension(memoryview(b"xxxx" + JPEG)[4:]) == ".jpg"
+    assert image_extension(b"RIFF....WEBP") == ".webp"
+
+
+def test_frame_written_as_is_from_a_view(tmp_path):
+    store = PreviewStore(str(tmp_path))
+    frame = b"\x00\x00\x00\x01\x00\x00\x00\x02" + PNG
+
+    path = store.write(memoryview(frame)[8:])
+
+    assert path.endswith(".png")
+    with open(path, "rb") as f:
+        assert f.read() == PNG
+    # Same content, same file
+    assert store.write(PNG) == path
+
+
+def test_files_deleted_once_old(tmp_path):
+    store = PreviewStore(str(tmp_path), max_age=60)
+    with patch("preview_store.time.monotonic", return_value=1000):
+        old = store.write(JPEG + b"old")
+        kept = store.write(JPEG + b"kept")
+    # However many frames arrive meanwhile, nothing younger than max_age goes
+    with patch("preview_store.time.monotonic", return_value=1030):
+        recent = [store.write(JPEG + str(n).encode()) for n in range(300)]
+        store.write(JPEG + b"kept")
+    assert all(os.path.exists(path) for path in [old, kept] + recent)
+
+    with patch("preview_store.time.monotonic", return_value=1061):
+        store.write(JPEG + b"new")
+    assert not os.path.exists(old)
+    # Written again in the meantime, so its age starts over
+    assert os.path.exists(kept)
@@ -0,0 +1,112 @@
+import os
+import pytest
+from PIL import Image
+import asyncio
+import renditions
+from renditions import DISPLAY_SIZE, THUMBNAIL_SIZE, RenditionStore
+
+
+def save_png(path, size):
+    Image.new("RGB", size, color="red").save(path, format="PNG")
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_large_image_gets_downscaled_renditions(tmp_path):
+    source = save_png(tmp_path / "abc123.png", (2048, 1024))
+    store = RenditionStore(str(tmp_path / "renditions"))
+
+    await store.render(source)
+
+    thumbnail = store.shown(source, "thumbnail")
+    display = store.shown(source, "display")
+    assert thumbnail.endswith(f"abc123-{THUMBNAIL_SIZE}.webp")
+    with Image.open(thumbnail) as image:
+        assert image.size == (THUMBNAIL_SIZE, THUMBNAIL_SIZE // 2)
+    with Image.open(display) as image:
+        assert max(image.size) == DISPLAY_SIZE
+
+
+@pytest.mark.asyncio
+async def test_small_image_shown_as_is(tmp_path):
+    source = save_png(tmp_path / "small.png", (256, 256))
+    store = RenditionStore(str(tmp_path / "renditions"))
+
+    await store.render(source)
+
+    assert store.shown_list([source, None], "thumbnail") == [source, None]
+    assert not os.path.exists(tmp_path / "renditions")
+
+
+@pytest.mark.asyncio
+async def test_original_shown_until_rendered_and_renditions_reused(tmp_path):
+    source = save_png(tmp_path / "big.png", (1024, 1024))
+    store = RenditionStore(str(tmp_path / "renditions"))
+    assert store.shown(source, "thumbnail") == source
+
+    await store.render(source)
+
+    # A later run finds the rendition on disk without rendering again
+    assert RenditionStore(str(tmp_path / "renditions")).shown(source, "thumbnail") == (
+        store.shown(source, "thumbnail")
+    )
+
+
+@pytest.mark.asyncio
+async def test_unreadable_source_is_skipped(tmp_path):
+    store = RenditionStore(str(tmp_path / "renditions"))
+    missing = str(tmp_path / "missing.png")
+
+    await store.render(missing)
+
+    assert store.shown(missing, "display") == missing
+
+
+@pytest.mark.asyncio
+async def test_removed_with_their_source(tmp_path):
+    source = save_png(tmp_path / "gone.png", (2048, 2048))
+    store = RenditionStore(str(tmp_path / "renditions"))
+    await store.render(source)
+    thumbnail = store.shown(source, "thumbnail")
+
+    store.remove(source)
+
+    assert not os.path.exists(thumbnail)
+    assert store.shown(source, "thumbnail") == source
+
+
+@pytest.mark.asyncio
+async def test_background_render_shows_original_until_done(tmp_path):
+    source = save_png(tmp_path / "later.png", (2048, 2048))
+    store = RenditionStore(str(tmp_path / "renditions"))
+
+    store.render_in_background(source)
+    store.render_in_background(source)
+    assert store.shown(source, "display") == source
+
+    await asyncio.gather(*store._rendering.values())
+    assert store.shown(source, "display") == store.path_for(source, "display")
+
+
+@pytest.mark.asyncio
+async def test_remembered_paths_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(renditions, "SHOWN_CACHE_SIZE", 2)
+    store = RenditionStore(str(tmp_path / "renditions"))
+    sources = [save_png(tmp_path / f"{n}.png", (2048, 2048)) for n in range(2)]
+    for source in sources:
+        await store.render(source)
+
+    assert len(store._shown) == 2
+    # Forgotten paths are found on disk again
+    assert store.shown(sources[0], "thumbnail") == store.path_for(sources[0], "thumbnail")
+
+
+@pytest.mark.asyncio
+async def test_only_requested_renditions_made(tmp_path):
+    source = save_png(tmp_path / "archived.png", (2048, 2048))
+    store = RenditionStore(str(tmp_path / "renditions"))
+
+    await store.render(source, ("thumbnail",))
+
+    assert os.path.exists(store.path_for(source, "thumbnail"))
+    assert not os.path.exists(store.path_for(source, "display"))
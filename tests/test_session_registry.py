@@ -0,0 +1,87 @@
+import pytest
+import asyncio
+from unittest.mock import MagicMock, AsyncMock, patch
+from session_registry import SessionRegistry, GenerationContext
+import ui
+from ui import process_generation
+
+
+def test_sessions_are_isolated():
+    registry = SessionRegistry()
+    alice = registry.get("alice")
+    bob = registry.get("bob")
+
+    assert registry.get("alice") is alice
+    assert alice is not bob
+
+    alice.skip_event.set()
+    assert not bob.skip_event.is_set()
+
+
+def test_remove_forgets_session():
+    registry = SessionRegistry()
+    context = registry.get("alice")
+
+    assert registry.remove("alice") is context
+    assert len(registry) == 0
+    assert registry.remove("alice") is None
+
+
+@pytest.mark.asyncio
+async def test_release_cancels_all_runs_of_session():
+    comfy_client = MagicMock()
+    comfy_client.cancel_prompts = AsyncMock()
+    context = GenerationContext()
+
+    first = context.start_run()
+    first.prompt_ids.append("p1")
+    second = context.start_run()
+    queued = asyncio.get_running_loop().create_future()
+    queued.set_result("p2")
+    second.submissions[0] = queued
+
+    context.release(comfy_client)
+    await asyncio.sleep(0)
+
+    cancelled = [call.args[0] for call in comfy_client.cancel_prompts.await_args_list]
+    assert sorted(cancelled) == [["p1"], ["p2"]]
+    assert not context.runs
+
+
+@pytest.mark.asyncio
+async def test_process_generation_registers_run_with_context():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+    comfy_client = MagicMock()
+    context = GenerationContext()
+    seen_runs = []
+
+    async def mock_gen(workflow):
+        seen_runs.append(len(context.runs))
+        yield {"type": "queued", "prompt_id": "p1"}
+        yield {"type": "image", "data": b"img"}
+
+    comfy_client.generate_image = MagicMock(side_effect=mock_gen)
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value={"1": {"inputs": {}, "class_type": "Node"}}):
+            with patch.object(ui.output_store, "write", return_value="Image"):
+                async for _ in process_generation(
+                    "test",
+                    "",
+                    {},
+                    1,
+                    config,
+                    comfy_client,
+                    {},
+                    [],
+                    context.skip_event,
+                    context=context,
+                ):
+                    pass
+
+    # The run is visible to the session while active and dropped when done
+    assert seen_runs == [1]
+    assert not context.runs
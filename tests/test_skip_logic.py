@@ -99,3 +99,41 @@ async def test_process_generation_skip_logic():
                             # It is called in on_skip (UI handler), but process_generation loop also checks skip_event.
                             # process_generation doesn't call interrupt() inside the loop (the button click does).
                             # So we don't check comfy_client.interrupt here.
+
+
+@pytest.mark.asyncio
+async def test_skip_cancels_only_current_prompt():
+    config = MagicMock()
+    config.workflows = [{"name": "test", "path": "test.json"}]
+    config.sliders = {}
+    comfy_client = MagicMock()
+    comfy_client.cancel_prompts = AsyncMock()
+    skip_event = asyncio.Event()
+    prompt_ids = iter(["first", "second"])
+
+    async def mock_generate(workflow):
+        prompt_id = next(prompt_ids)
+        yield {"type": "queued", "prompt_id": prompt_id}
+        yield {"type": "progress", "value": 1, "max": 2}
+        if prompt_id == "first":
+            await asyncio.sleep(3600)
+
+    comfy_client.generate_image = MagicMock(side_effect=mock_generate)
+
+    with patch("builtins.open", new_callable=MagicMock) as mock_file:
+        mock_file.return_value.__enter__.return_value = mock_file
+        with patch("json.load", return_value={"1": {"inputs": {}, "class_type": "Node"}}):
+            task = asyncio.create_task(
+                list_async(
+                    process_generation("test", "", {}, 2, config, comfy_client, {}, [], skip_event)
+                )
+            )
+            await asyncio.sleep(0.1)
+            skip_event.set()
+            await asyncio.wait_for(task, 1)
+            await asyncio.sleep(0)
+
+    # Other sessions' work is never touched: no global interrupt or queue clear
+    comfy_client.interrupt.assert_not_called()
+    comfy_client.clear_queue.assert_not_called()
+    comfy_client.cancel_prompts.assert_awaited_once_with(["first"])
@@ -0,0 +1,29 @@
+import builtins
+from startup_profile import StartupProfile
+
+
+def test_disabled_profile_leaves_imports_alone():
+    original = builtins.__import__
+    profile = StartupProfile()
+
+    with profile.phase("work"):
+        pass
+
+    assert builtins.__import__ is original
+    assert profile.phases == []
+
+
+def test_phases_and_imports_reported(capsys):
+    original = builtins.__import__
+    profile = StartupProfile(enabled=True)
+
+    with profile.phase("import"):
+        import colorsys  # noqa: F401 - any stdlib module not imported yet
+
+    profile.report()
+
+    assert builtins.__import__ is original
+    assert [name for name, _ in profile.phases] == ["import"]
+    output = capsys.readouterr().out
+    assert "Startup profile:" in output
+    assert "import" in output
@@ -1,5 +1,6 @@
 import pytest
 import gradio as gr
+import ui
 from ui import create_ui, handle_generation
 from config_manager import ConfigManager
 from unittest.mock import Mock, AsyncMock, patch, mock_open
@@ -24,7 +25,10 @@ async def test_handle_generation_success():
     # Mock open and json.load
     with patch("builtins.open", mock_open(read_data='{"mock": "workflow"}')):
         with patch("json.load", return_value={"mock": "workflow"}):
-            with patch("ui.Image.open", side_effect=["mock_preview_image", "mock_pil_image"]):
+            with (
+                patch.object(ui.preview_store, "write", return_value="mock_preview_image"),
+                patch.object(ui.output_store, "write", return_value="mock_pil_image"),
+            ):
                 updates = []
                 async for update in handle_generation("Workflow 1", "User Prompt", config, client):
                     updates.append(update)
@@ -72,7 +76,7 @@ async def test_handle_generation_multiple_images():
     # Mock open and json.load
     with patch("builtins.open", mock_open(read_data='{"mock": "workflow"}')):
         with patch("json.load", return_value={"mock": "workflow"}):
-            with patch("ui.Image.open", side_effect=["pil_img1", "pil_img2"]):
+            with patch.object(ui.output_store, "write", side_effect=["pil_img1", "pil_img2"]):
                 updates = []
                 async for update in handle_generation("Workflow 1", "User Prompt", config, client):
                     updates.append(update)
@@ -199,3 +203,38 @@ def test_extract_workflow_inputs_dimension_grouping():
 
     # Other inputs should remain
     assert any(i["name"] == "batch_size" for i in node_inputs)
+
+
+@pytest.mark.asyncio
+async def test_history_tab_shows_each_browser_its_own_images(tmp_path):
+    from history_db import HistoryDB
+
+    config = Mock(spec=ConfigManager)
+    config.workflows = [{"name": "Workflow 1", "path": "wf1.json"}]
+    config.history_db = str(tmp_path / "history.sqlite3")
+    config.cache_dir = str(tmp_path / "cache")
+    demo = create_ui(config, Mock(base_url="http://localhost:8188"))
+    first_history_page = next(
+        block_fn.fn for block_fn in demo.fns.values() if block_fn.name == "first_history_page"
+    )
+
+    db = HistoryDB(config.history_db)
+    db.add([("/outputs/a.png", None)], 1.0, owner="browser-a", workflow_name="Workflow 1")
+    db.add([("/outputs/b.png", None)], 2.0, owner="browser-b", workflow_name="Workflow 1")
+    db.add([("/outputs/c.png", None)], 3.0, owner="alice", workflow_name="Workflow 1")
+    db.close()
+
+    async def originals(browser_id, **request):
+        result = await first_history_page("All workflows", browser_id, gr.Request(**request))
+        return result[1]
+
+    # Anonymous visitors keep their history across reloads, which change the session
+    assert await originals("browser-a", session_hash="first") == ["/outputs/a.png"]
+    assert await originals("browser-a", session_hash="reloaded") == ["/outputs/a.png"]
+    assert await originals("browser-b", session_hash="other") == ["/outputs/b.png"]
+    # Signed in users see what they made, whichever browser they use
+    assert await originals("browser-a", username="alice", session_hash="s") == ["/outputs/c.png"]
+    # The id kept in the browser is stable and only made once
+    assert ui.assign_browser_id("browser-a") == "browser-a"
+    assert ui.assign_browser_id(None) != ui.assign_browser_id(None)
+    assert ui.browser_state_secret(config.cache_dir) == ui.browser_state_secret(config.cache_dir)
@@ -184,3 +184,54 @@ def test_extract_workflow_inputs_sliders():
     # other should be number
     other = next(i for i in node["inputs"] if i["name"] == "other")
     assert other["type"] == "number"
+
+
+def test_merge_workflow_overrides_copies_only_touched_nodes():
+    from ui import merge_workflow_overrides
+    from workflow_registry import freeze
+
+    workflow = freeze(
+        {
+            "1": {"inputs": {"seed": 1}},
+            "2": {"inputs": {"text": "default"}},
+            "3": {"inputs": {"steps": 20}},
+        }
+    )
+
+    merged = merge_workflow_overrides(workflow, {"1.seed": "42"}, writable_nodes=("2",))
+    merged["2"]["inputs"]["text"] = "injected"
+
+    assert merged["1"]["inputs"]["seed"] == 42
+    assert workflow["1"]["inputs"]["seed"] == 1
+    assert workflow["2"]["inputs"]["text"] == "default"
+    # Untouched nodes are shared rather than copied, and stay read-only
+    assert merged["3"] is workflow["3"]
+    with pytest.raises(TypeError):
+        merged["3"]["inputs"]["steps"] = 30
+
+
+def test_override_plan_reused_per_key_set():
+    from override_plan import compile_override_plan
+
+    workflow = {"1": {"inputs": {"seed": 1}}}
+    plan = compile_override_plan(workflow, ["1.seed", "1.seed.randomize"])
+
+    assert compile_override_plan(workflow, ["1.seed.randomize", "1.seed"]) is plan
+    assert plan.slots == {"1.seed": ("1", "seed")}
+    assert plan.apply({"1.seed": 7, "1.seed.randomize": True})["1"]["inputs"]["seed"] == 7
+
+
+def test_cached_workflow_inputs_shared_and_read_only():
+    from ui import cached_workflow_inputs
+
+    workflow = {"1": {"class_type": "KSampler", "inputs": {"steps": 20, "seed": 5}}}
+    sliders = {"steps": {"min": 1, "max": 100, "step": 1}}
+
+    extracted = cached_workflow_inputs(workflow, None, sliders)
+    assert cached_workflow_inputs(workflow, None, dict(sliders)) is extracted
+    assert extracted[0]["inputs"][0]["type"] == "slider"
+    with pytest.raises(TypeError):
+        extracted[0]["inputs"][0]["value"] = 1
+
+    # Different slider settings are extracted separately
+    assert cached_workflow_inputs(workflow, None, {})[0]["inputs"][0]["type"] == "number"
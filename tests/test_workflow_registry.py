@@ -0,0 +1,68 @@
+import pytest
+import copy
+import json
+import os
+from workflow_registry import WorkflowRegistry
+
+
+def write_workflow(path, workflow, mtime_ns):
+    path.write_text(json.dumps(workflow))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_parsed_once_while_unchanged(tmp_path):
+    path = tmp_path / "wf.json"
+    write_workflow(path, {"1": {"inputs": {}}}, 1_000_000_000)
+    registry = WorkflowRegistry()
+
+    first = registry.load(str(path))
+    assert registry.load(str(path)) is first
+    assert first == {"1": {"inputs": {}}}
+
+
+def test_shared_workflow_is_read_only(tmp_path):
+    path = tmp_path / "wf.json"
+    workflow = {"1": {"inputs": {"seed": 1, "model": ["2", 0]}}}
+    write_workflow(path, workflow, 1_000_000_000)
+    registry = WorkflowRegistry()
+    shared = registry.load(str(path))
+
+    with pytest.raises(TypeError):
+        shared["2"] = {"inputs": {}}
+    # Frozen all the way down, not just the top level
+    with pytest.raises(TypeError):
+        shared["1"]["inputs"]["seed"] = 2
+    with pytest.raises(TypeError):
+        shared["1"]["inputs"]["model"].append(1)
+    assert registry.load(str(path)) == workflow
+    # Still encodes like the parsed JSON, and copies are writable
+    assert json.loads(json.dumps(shared)) == workflow
+    copied = copy.deepcopy(shared)
+    copied["1"]["inputs"]["seed"] = 2
+    assert shared["1"]["inputs"]["seed"] == 1
+
+
+def test_reparsed_after_edit(tmp_path):
+    path = tmp_path / "wf.json"
+    write_workflow(path, {"1": {"inputs": {}}}, 1_000_000_000)
+    registry = WorkflowRegistry()
+    registry.load(str(path))
+
+    write_workflow(path, {"2": {"inputs": {}}}, 2_000_000_000)
+    assert registry.load(str(path)) == {"2": {"inputs": {}}}
+
+
+def test_touch_without_edit_keeps_parsed_workflow(tmp_path):
+    path = tmp_path / "wf.json"
+    write_workflow(path, {"1": {"inputs": {}}}, 1_000_000_000)
+    registry = WorkflowRegistry()
+    first = registry.load(str(path))
+
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000))
+    assert registry.load(str(path)) is first
+
+
+def test_missing_file_raises(tmp_path):
+    registry = WorkflowRegistry()
+    with pytest.raises(FileNotFoundError):
+        registry.load(str(tmp_path / "missing.json"))